@@ -0,0 +1,68 @@
+"""Times a physics step with many dynamic bodies on a map.
+
+Debris bodies are scattered around the map's origin and left to fall
+through its gravity along with the ship.
+
+Run from the repository root:
+
+    python benchmarks/bodies.py --map final_map --bodies 10 100 500
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pyglet
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument("--map", default="final_map")
+parser.add_argument("--bodies", type=int, nargs="+", default=[10, 100, 500])
+parser.add_argument("--steps", type=int, default=120)
+parser.add_argument(
+    "--egl", action="store_true", help="render off screen through EGL, no display"
+)
+args = parser.parse_args()
+
+if args.egl:
+    pyglet.options["headless"] = True
+
+from game.common import get_active_map_entity
+from game.components import DynamicComponent, PhysicsComponent
+from game.ecs import Entity, System
+from game.game import create_game
+from game.settings import settings
+from game.vector import V2
+
+# The default settings, whatever settings.json holds, left unsaved
+settings.in_memory()
+create_game(visible=False)
+System.update_all()
+settings.physics_frozen = False
+System.dispatch(event="LoadMap", map_name=args.map, mode="freeplay")
+System.update_all()
+
+physics_system = Entity.world.systems["PhysicsSystem"]
+origin = get_active_map_entity()["map"].origin
+random.seed(34)
+debris = []
+for count in args.bodies:
+    while len(debris) < count:
+        entity = Entity()
+        offset = V2.from_degrees_and_length(
+            random.uniform(0, 360), random.uniform(500, 20000)
+        )
+        entity.attach(PhysicsComponent(position=origin + offset))
+        entity.attach(DynamicComponent())
+        debris.append(entity)
+
+    durations = []
+    for _ in range(args.steps):
+        start = time.perf_counter()
+        physics_system.update()
+        durations.append(time.perf_counter() - start)
+    durations.sort()
+    median = durations[len(durations) // 2] * 1000
+    print(f"{count:>6} bodies: median {median:8.3f} ms per step")
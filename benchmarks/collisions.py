@@ -0,0 +1,100 @@
+"""Times the ship's collision test as a map fills up with colliders.
+
+Asteroids are scattered over a square around the map's origin, as in a
+dense asteroid field. Each count is timed through the physics system's
+spatial hash and through a plain test against every collider, for
+comparison.
+
+Run from the repository root:
+
+    python benchmarks/collisions.py --map slalom_map --colliders 0 1000 10000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pyglet
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument("--map", default="slalom_map")
+parser.add_argument("--colliders", type=int, nargs="+", default=[0, 1000, 10000])
+parser.add_argument("--steps", type=int, default=200)
+parser.add_argument(
+    "--egl", action="store_true", help="render off screen through EGL, no display"
+)
+args = parser.parse_args()
+
+if args.egl:
+    pyglet.options["headless"] = True
+
+from game.common import get_active_map_entity, get_ship_entity
+from game.components import CollisionComponent, PhysicsComponent
+from game.ecs import Entity, System
+from game.game import create_game
+from game.settings import settings
+from game.vector import V2
+
+# The default settings, whatever settings.json holds, left unsaved
+settings.in_memory()
+create_game(visible=False)
+System.update_all()
+settings.physics_frozen = False
+System.dispatch(event="LoadMap", map_name=args.map, mode="freeplay")
+System.update_all()
+
+physics_system = Entity.world.systems["PhysicsSystem"]
+origin = get_active_map_entity()["map"].origin
+ship = get_ship_entity()
+
+
+def every_collider():
+    "The test before the broad phase, against every collider"
+    physics = ship["physics"]
+    collision = ship["collision"]
+    for collider in physics_system.colliders:
+        if collider.entity_id == ship.entity_id:
+            continue
+        separation = physics.position - collider["physics"].position
+        if separation.length < collision.circle_radius + collider["collision"].circle_radius:
+            pass
+
+
+def median(test):
+    durations = []
+    for _ in range(args.steps):
+        start = time.perf_counter()
+        test()
+        durations.append(time.perf_counter() - start)
+    durations.sort()
+    return durations[len(durations) // 2] * 1000
+
+
+def hashed():
+    # As the scheduler runs it, only changes since the last step count
+    tick = Entity.world.change_tick
+    physics_system.update_collision_hash()
+    physics_system.update_ship_collision()
+    physics_system.last_run = tick
+
+
+random.seed(34)
+added = 0
+for count in args.colliders:
+    while added < count:
+        entity = Entity()
+        offset = V2(random.uniform(-50000, 50000), random.uniform(-50000, 50000))
+        entity.attach(PhysicsComponent(position=origin + offset))
+        entity.attach(CollisionComponent(circle_radius=60))
+        added += 1
+    # Inserts the new colliders, then lets every system catch up so the
+    # change log is pruned
+    for _ in range(2):
+        System.advance(1 / 60)
+    print(
+        f"{count:>6} extra colliders: hashed {median(hashed):7.3f} ms, "
+        f"every collider {median(every_collider):7.3f} ms"
+    )
@@ -0,0 +1,92 @@
+"""Replays one scripted race several times and checks the runs match.
+
+Each run is a fresh interpreter simulating headless, racing a map with an
+autopilot that aims at the next checkpoint the way the mouse does. Every
+step's ship state is hashed, so runs match only if their trajectories are
+bit identical. The wall time of each run is printed too, which makes this
+a fixed workload for comparing performance changes.
+
+Runs use the default settings, whatever settings.json holds, and never
+save them or a personal best, so every run races the same ghost.
+
+Run from the repository root:
+
+    python benchmarks/determinism.py --map speedy_map --runs 3
+"""
+import argparse
+import hashlib
+import json
+import os
+import struct
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_once(map_name, steps):
+    "Races the map once in this process, returns the trajectory digest"
+    sys.path.insert(0, ROOT)
+    from game.headless import Simulation
+
+    sim = Simulation(map_name)
+    ship = sim.ship["physics"]
+    checkpoints = sim.world.query("physics", "checkpoint")
+    digest = hashlib.sha256()
+    start = time.perf_counter()
+    for step in range(steps):
+        # Thrust towards the velocity that heads for the next checkpoint,
+        # the finish included
+        aim = None
+        ahead = [e for e in checkpoints if not e["checkpoint"].completed]
+        if ahead:
+            next_cp = min(ahead, key=lambda e: e["checkpoint"].cp_order)
+            target = next_cp["physics"].position - ship.position
+            aim = target.normalized * min(target.length / 20, 30) - ship.velocity
+        turn = aim.degrees - 90 if aim is not None and aim.length > 0 else None
+        sim.step(w=aim is not None and aim.length > 1, aim=turn)
+        digest.update(struct.pack("<5d", *ship.position, *ship.velocity, ship.rotation))
+        if sim.finish_time is not None:
+            break
+    return {
+        "digest": digest.hexdigest(),
+        "steps": step + 1,
+        "finish": sim.finish_time,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument("--map", default="speedy_map")
+parser.add_argument("--runs", type=int, default=3)
+parser.add_argument("--steps", type=int, default=5000)
+parser.add_argument("--once", action="store_true", help=argparse.SUPPRESS)
+args = parser.parse_args()
+
+if args.once:
+    print(json.dumps(run_once(args.map, args.steps)))
+    sys.exit()
+
+command = [sys.executable, os.path.abspath(__file__), "--once"]
+command += ["--map", args.map, "--steps", str(args.steps)]
+
+runs = []
+for i in range(args.runs):
+    output = subprocess.run(
+        command, cwd=ROOT, check=True, capture_output=True, text=True
+    ).stdout
+    run = json.loads(output.strip().splitlines()[-1])
+    runs.append(run)
+    finish = "did not finish" if run["finish"] is None else f"finished in {run['finish']:.4f} s"
+    print(
+        f"run {i + 1}: {run['steps']} steps, {finish}, "
+        f"{run['seconds']:.2f} s wall, {run['digest'][:16]}"
+    )
+
+identical = all(
+    (run["digest"], run["finish"]) == (runs[0]["digest"], runs[0]["finish"])
+    for run in runs
+)
+print("identical" if identical else "RUNS DIFFER")
+sys.exit(0 if identical else 1)
@@ -0,0 +1,87 @@
+"""Times lighting up the flight path flares as the ship flies the path.
+
+The ship is moved point by point along the map's flight path, and each
+move is timed through the physics system's flare index and through the
+old pass over every flare, for comparison.
+
+Run from the repository root:
+
+    python benchmarks/flares.py --map final_map
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pyglet
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument("--map", default="final_map")
+parser.add_argument(
+    "--egl", action="store_true", help="render off screen through EGL, no display"
+)
+args = parser.parse_args()
+
+if args.egl:
+    pyglet.options["headless"] = True
+
+from game.common import get_ship_entity
+from game.ecs import Entity, System
+from game.game import create_game
+from game.settings import settings
+from game.spatial import FLARE_DISTANCE
+from game.vector import V2
+
+# The default settings, whatever settings.json holds, left unsaved
+settings.in_memory()
+create_game(visible=False)
+System.update_all()
+settings.physics_frozen = False
+System.dispatch(event="LoadMap", map_name=args.map, mode="freeplay")
+System.update_all()
+
+physics_system = Entity.world.systems["PhysicsSystem"]
+ship = get_ship_entity()
+path = [p for fp in Entity.world.components("flight path") for p in fp.path]
+flares = [s for fp in Entity.world.components("flight path") for s in fp.flares]
+
+
+def every_flare():
+    "The pass before the index, over every flare"
+    ship_position = ship["physics"].position
+    for s in flares:
+        distance = (ship_position - V2(s.x, s.y)).length
+        if distance < FLARE_DISTANCE:
+            s.visible = True
+            s.opacity = int(255 * (1 - (distance / FLARE_DISTANCE)))
+        else:
+            s.visible = False
+
+
+def indexed():
+    # As the scheduler runs it, only changes since the last step count
+    tick = Entity.world.change_tick
+    physics_system.update_flares()
+    physics_system.last_run = tick
+
+
+def fly(test):
+    "Median milliseconds per point of the path, and the flares left lit"
+    durations = []
+    for point in path:
+        ship["physics"].position = point
+        start = time.perf_counter()
+        test()
+        durations.append(time.perf_counter() - start)
+    durations.sort()
+    lit = sum(1 for s in flares if s.visible)
+    return durations[len(durations) // 2] * 1000, lit
+
+
+indexed_ms, indexed_lit = fly(indexed)
+every_ms, every_lit = fly(every_flare)
+print(f"{len(flares)} flares along {len(path)} points of {args.map}")
+print(f"indexed      {indexed_ms:7.3f} ms, {indexed_lit} lit at the end")
+print(f"every flare  {every_ms:7.3f} ms, {every_lit} lit at the end")
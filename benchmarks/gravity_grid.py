@@ -0,0 +1,107 @@
+"""Checks a map's baked gravity grid against exact summation.
+
+For each grid spacing, reports how long baking and loading the cached grid
+take, how far the sampled acceleration strays from summing every static
+mass exactly, and a physics step with debris bodies on either path.
+
+Run from the repository root:
+
+    python benchmarks/gravity_grid.py --map final_map --spacing 10 25 50 100
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pyglet
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument("--map", default="final_map")
+parser.add_argument("--spacing", type=float, nargs="+", default=[10, 25, 50, 100])
+parser.add_argument("--bodies", type=int, default=500)
+parser.add_argument("--steps", type=int, default=120)
+parser.add_argument(
+    "--egl", action="store_true", help="render off screen through EGL, no display"
+)
+args = parser.parse_args()
+
+if args.egl:
+    pyglet.options["headless"] = True
+
+from game import gravity
+from game.common import get_active_map_entity
+from game.components import DynamicComponent, PhysicsComponent
+from game.ecs import Entity, System
+from game.game import create_game
+from game.settings import settings
+from game.vector import V2
+
+# Keep the real cache untouched
+gravity.CACHE_DIR = tempfile.mkdtemp()
+gravity.GRAVITY_GRID = True
+
+# The default settings, whatever settings.json holds, left unsaved
+settings.in_memory()
+create_game(visible=False)
+System.update_all()
+settings.physics_frozen = False
+System.dispatch(event="LoadMap", map_name=args.map, mode="freeplay")
+System.update_all()
+
+physics_system = Entity.world.systems["PhysicsSystem"]
+origin = get_active_map_entity()["map"].origin
+random.seed(34)
+for _ in range(args.bodies):
+    entity = Entity()
+    offset = V2.from_degrees_and_length(random.uniform(0, 360), random.uniform(500, 20000))
+    entity.attach(PhysicsComponent(position=origin + offset))
+    entity.attach(DynamicComponent())
+
+baked = physics_system.grid
+mass_positions, masses = baked.masses
+baked_settings = (baked.gravity, baked.max_grav_acc)
+rows, columns = baked.field.shape[:2]
+bounds = (baked.origin, baked.origin + np.array([columns - 1, rows - 1]) * baked.spacing)
+print(
+    f"{args.map}: {len(masses)} static masses, "
+    f"acceleration clamped to {baked.max_grav_acc}"
+)
+
+
+def median_step():
+    durations = []
+    for _ in range(args.steps):
+        start = time.perf_counter()
+        physics_system.update()
+        durations.append(time.perf_counter() - start)
+    durations.sort()
+    return durations[len(durations) // 2] * 1000
+
+
+physics_system.grid = None
+print(f"{'exact':>8}: step {median_step():7.3f} ms with {args.bodies} bodies")
+
+for spacing in args.spacing:
+    start = time.perf_counter()
+    grid = gravity.GravityGrid.for_map(
+        args.map, mass_positions, masses, bounds, *baked_settings, spacing
+    )
+    baked = time.perf_counter()
+    gravity.GravityGrid.for_map(
+        args.map, mass_positions, masses, bounds, *baked_settings, spacing
+    )
+    loaded = time.perf_counter()
+    mean, p99, worst = grid.error()
+    physics_system.grid = grid
+    step = median_step()
+    print(
+        f"{spacing:>8g}: {grid.field.shape[1]}x{grid.field.shape[0]} nodes, "
+        f"bake {(baked - start) * 1000:7.1f} ms, cached {(loaded - baked) * 1000:6.1f} ms, "
+        f"error mean {mean:.1e} p99 {p99:.1e} worst {worst:.1e}, "
+        f"step {step:7.3f} ms"
+    )
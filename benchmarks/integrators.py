@@ -0,0 +1,104 @@
+"""Compares the integrators and sub-stepping in close flybys of a mass.
+
+Bodies with no drag are sent past a black hole at a spread of distances,
+then each integrator is run with and without adaptive sub-steps. Their
+positions are checked against a reference run at 64 steps per tick, and
+their energy against the energy they started with. The same bodies far
+out in open space show what sub-stepping costs when it isn't needed.
+
+Run from the repository root:
+
+    python benchmarks/integrators.py --bodies 200 --steps 600
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pyglet
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument("--bodies", type=int, default=200)
+parser.add_argument("--steps", type=int, default=600)
+parser.add_argument("--mass", type=float, default=1000.0, help="black hole mass")
+parser.add_argument("--speed", type=float, default=30.0, help="units per tick")
+parser.add_argument(
+    "--egl", action="store_true", help="render off screen through EGL, no display"
+)
+args = parser.parse_args()
+
+if args.egl:
+    pyglet.options["headless"] = True
+
+from game import bodies
+from game.components import DynamicComponent, PhysicsComponent
+from game.ecs import Entity, World
+from game.vector import V2
+
+GRAV_CONSTANT = 100.0
+MAX_GRAV_ACC = 0.18
+
+world = World()
+world.activate()
+Entity().attach(PhysicsComponent(mass=args.mass))
+for i in range(args.bodies):
+    entity = Entity()
+    entity.attach(PhysicsComponent(drag_constant=0.0))
+    entity.attach(DynamicComponent())
+store = bodies.Bodies(world)
+store.gather()
+
+# Closest approach, were there no gravity, from 300 to 3000 units
+miss = np.linspace(300, 3000, args.bodies)
+start = np.stack([np.full(args.bodies, -args.speed * args.steps / 2), miss], axis=1)
+start_velocity = np.tile([args.speed, 0.0], (args.bodies, 1))
+
+
+def energy(position, velocity):
+    "Kinetic plus potential energy, the potential of the clamped pull"
+    r = np.hypot(position[:, 0], position[:, 1])
+    gm = GRAV_CONSTANT * args.mass
+    clamped = np.sqrt(gm / MAX_GRAV_ACC)
+    potential = np.where(
+        r >= clamped, -gm / r, -gm / clamped + MAX_GRAV_ACC * (r - clamped)
+    )
+    return 0.5 * np.einsum("ij,ij->i", velocity, velocity) + potential
+
+
+def run(integrator, max_substeps, offset=(0.0, 0.0), ticks_per_step=1):
+    "Returns final positions, worst relative energy drift and seconds per step"
+    bodies.INTEGRATOR = integrator
+    bodies.MAX_SUBSTEPS = max_substeps
+    store.position = start + offset
+    store.velocity = start_velocity.copy()
+    initial = energy(store.position - offset, store.velocity)
+    drift = np.zeros(args.bodies)
+    began = time.perf_counter()
+    for _ in range(args.steps):
+        for _ in range(ticks_per_step):
+            store.acceleration[:] = 0.0
+            store.integrate(1 / ticks_per_step, GRAV_CONSTANT, MAX_GRAV_ACC)
+        current = energy(store.position - offset, store.velocity)
+        drift = np.maximum(drift, np.abs(current - initial) / np.abs(initial))
+    elapsed = time.perf_counter() - began
+    return store.position - offset, drift.max(), elapsed / args.steps
+
+
+reference, _, _ = run("verlet", 1, ticks_per_step=64)
+far = (1e6, 1e6)
+
+print(f"{args.bodies} bodies past a mass of {args.mass:g}, {args.steps} steps")
+for integrator in ("euler", "verlet"):
+    for max_substeps in (1, 8):
+        position, drift, seconds = run(integrator, max_substeps)
+        _, _, open_seconds = run(integrator, max_substeps, offset=far)
+        error = np.hypot(*(position - reference).T)
+        print(
+            f"{integrator:>6}, up to {max_substeps} sub-steps: "
+            f"{1 / seconds:8.0f} steps/s near, {1 / open_seconds:8.0f} in open space, "
+            f"error mean {error.mean():8.2f} worst {error.max():8.2f}, "
+            f"energy drift {drift:.1e}"
+        )
@@ -0,0 +1,102 @@
+"""Reports how much memory the components of a loaded map take per entity.
+
+The ship races at full thrust for a while first so the racing line holds
+a realistic number of points. Component bytes walk every component and the
+plain Python values it holds, stopping at entities and at pyglet objects
+such as sprites, images and batches. Allocated bytes are everything traced
+while the map loaded and the race ran, GL side objects included.
+
+Run from the repository root:
+
+    python benchmarks/memory.py --map final_map
+"""
+import argparse
+import os
+import sys
+import tracemalloc
+
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pyglet
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument("--map", default="final_map")
+parser.add_argument(
+    "--race",
+    type=float,
+    default=20.0,
+    help="seconds to race at full thrust first, so the racing line fills up",
+)
+parser.add_argument(
+    "--egl", action="store_true", help="render off screen through EGL, no display"
+)
+args = parser.parse_args()
+
+if args.egl:
+    pyglet.options["headless"] = True
+
+from game.common import get_inputs
+from game.ecs import FIXED_DELTA_TIME, Entity, System
+from game.game import create_game
+from game.settings import settings
+
+
+def deep_size(value, seen):
+    if id(value) in seen or isinstance(value, Entity):
+        return 0
+    if type(value).__module__.startswith("pyglet"):
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, (str, bytes, int, float, bool, array)) or value is None:
+        return size
+    if isinstance(value, dict):
+        return size + sum(
+            deep_size(k, seen) + deep_size(v, seen) for k, v in value.items()
+        )
+    if isinstance(value, (list, tuple, set)):
+        return size + sum(deep_size(item, seen) for item in value)
+    if hasattr(value, "__dict__"):
+        size += deep_size(value.__dict__, seen)
+    for cls in type(value).__mro__:
+        for name in getattr(cls, "__slots__", ()):
+            if hasattr(value, name):
+                size += deep_size(getattr(value, name), seen)
+    return size
+
+
+# The default settings, whatever settings.json holds, left unsaved
+settings.in_memory()
+create_game(visible=False)
+System.update_all()
+settings.physics_frozen = False
+
+tracemalloc.start()
+before, _ = tracemalloc.get_traced_memory()
+System.dispatch(event="LoadMap", map_name=args.map, mode="racing")
+System.update_all()
+get_inputs().w = True
+for _ in range(int(args.race / FIXED_DELTA_TIME)):
+    System.advance(FIXED_DELTA_TIME)
+after, _ = tracemalloc.get_traced_memory()
+tracemalloc.stop()
+
+world = Entity.world
+entities = [e for e in world.slots if e is not None and not e.destroyed]
+seen = set()
+by_component = {}
+for entity in entities:
+    for name, component in entity.components.items():
+        by_component[name] = by_component.get(name, 0) + deep_size(component, seen)
+
+total = sum(by_component.values())
+print(f"{args.map}: {len(entities)} entities")
+print(f"{'component bytes':>18}: {total:10d} total, {total / len(entities):8.0f} per entity")
+print(
+    f"{'allocated bytes':>18}: {after - before:10d} total, "
+    f"{(after - before) / len(entities):8.0f} per entity"
+)
+for name, size in sorted(by_component.items(), key=lambda item: -item[1]):
+    print(f"{name:>18}: {size:10d}")
@@ -0,0 +1,108 @@
+"""Times emitting, fading and drawing thrust particles.
+
+Each emitter emits one particle a step and fades the rest, as the ship's
+thrust does while boosting. The particle engine is compared with pooled
+sprites faded one at a time, the way the thrust emitter used to work,
+for an increasing number of emitters all drawn from one batch.
+
+Run from the repository root:
+
+    python benchmarks/particles.py --emitters 1 10 50 --egl
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pyglet
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument("--emitters", type=int, nargs="+", default=[1, 10, 50])
+parser.add_argument("--steps", type=int, default=300)
+parser.add_argument(
+    "--egl", action="store_true", help="render off screen through EGL, no display"
+)
+args = parser.parse_args()
+
+if args.egl:
+    pyglet.options["headless"] = True
+
+from game.particles import Particles
+from game.pool import GL_ONE, GL_SRC_ALPHA, POOL
+
+window = pyglet.window.Window(640, 480, visible=False)
+
+
+def load(name):
+    image = pyglet.image.load(os.path.join("assets", name))
+    image.anchor_x = image.width // 2
+    image.anchor_y = image.height // 2
+    return image
+
+
+images = [load("energy-particle-cyan-64x64.png"), load("energy-particle-red-64x64.png")]
+FADE = 0.9
+
+
+def pooled_sprites(count, batch):
+    emitters = [[] for _ in range(count)]
+
+    def step(i):
+        for e, sprites in enumerate(emitters):
+            for sprite in sprites:
+                sprite.opacity *= FADE
+            for sprite in [s for s in sprites if s.opacity < 0.01]:
+                POOL.release(sprite)
+            sprites[:] = [s for s in sprites if s.opacity >= 0.01]
+            sprite = POOL.sprite(
+                images[i % 2],
+                x=e * 10 + i,
+                y=e * 10,
+                batch=batch,
+                blend_src=GL_SRC_ALPHA,
+                blend_dest=GL_ONE,
+            )
+            sprite.rotation = -i
+            sprites.append(sprite)
+
+    return step
+
+
+def particle_engine(count, batch):
+    emitters = [Particles(images, batch, blend_dest=GL_ONE) for _ in range(count)]
+
+    def step(i):
+        for e, particles in enumerate(emitters):
+            particles.fade(FADE)
+            particles.emit(e * 10 + i, e * 10, i, image=i % 2)
+
+    return step
+
+
+def median_ms(make, count):
+    batch = pyglet.graphics.Batch()
+    step = make(count, batch)
+    update = []
+    draw = []
+    for i in range(args.steps):
+        start = time.perf_counter()
+        step(i)
+        update.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        batch.draw()
+        draw.append(time.perf_counter() - start)
+    update.sort()
+    draw.sort()
+    middle = args.steps // 2
+    return update[middle] * 1000, draw[middle] * 1000
+
+
+for count in args.emitters:
+    for name, make in (("sprites", pooled_sprites), ("particles", particle_engine)):
+        update, draw = median_ms(make, count)
+        print(
+            f"{count:>4} emitters, {name:>9}: update {update:7.3f} ms, "
+            f"draw {draw:7.3f} ms"
+        )
@@ -0,0 +1,71 @@
+"""Compares restarting a race by reloading the map against restoring the
+snapshot taken when the map loaded.
+
+Run from the repository root:
+
+    python benchmarks/restart.py --map final_map --repeat 20
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pyglet
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument("--map", default="final_map")
+parser.add_argument("--repeat", type=int, default=20)
+parser.add_argument(
+    "--egl", action="store_true", help="render off screen through EGL, no display"
+)
+args = parser.parse_args()
+
+if args.egl:
+    pyglet.options["headless"] = True
+
+from game.common import get_active_map_entity
+from game.ecs import Entity, System
+from game.game import create_game
+from game.settings import settings
+
+
+def time_restarts(dispatch):
+    durations = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        dispatch()
+        System.drain_events()
+        Entity.clean_pending_destruction()
+        durations.append(time.perf_counter() - start)
+    durations.sort()
+    return durations[len(durations) // 2] * 1000, min(durations) * 1000
+
+
+# The default settings, whatever settings.json holds, left unsaved
+settings.in_memory()
+create_game(visible=False)
+System.update_all()
+settings.physics_frozen = False
+System.dispatch(event="LoadMap", map_name=args.map, mode="racing")
+System.update_all()
+
+
+def reload_map():
+    System.dispatch(event="LoadMap", map_name=args.map, mode="racing")
+
+
+def restore_snapshot():
+    map_entity = get_active_map_entity()
+    System.dispatch(event="RestartMap", map_entity_id=map_entity.entity_id)
+
+
+blob = get_active_map_entity()["map"].restart_snapshot
+print(f"{args.map}: snapshot is {len(blob)} bytes")
+for name, dispatch in (
+    ("reload map", reload_map),
+    ("restore snapshot", restore_snapshot),
+):
+    median, best = time_restarts(dispatch)
+    print(f"{name:>18}: median {median:8.2f} ms, best {best:8.2f} ms")
@@ -0,0 +1,71 @@
+"""Measures how long the game takes to get to its first frame.
+
+Each run is a fresh interpreter, timing the imports, create_game and the
+first frame, which displays the main menu.
+
+Run from the repository root:
+
+    python benchmarks/startup.py --repeat 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_once(egl):
+    "Starts the game once in this process and returns the phase timings"
+    sys.path.insert(0, ROOT)
+    import pyglet
+
+    if egl:
+        pyglet.options["headless"] = True
+
+    start = time.perf_counter()
+    from game.ecs import System
+    from game.game import create_game
+
+    imported = time.perf_counter()
+    create_game(visible=False)
+    created = time.perf_counter()
+    System.advance(1 / 60)
+    first_frame = time.perf_counter()
+    return {
+        "import": imported - start,
+        "create_game": created - imported,
+        "first frame": first_frame - created,
+        "total": first_frame - start,
+    }
+
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument("--repeat", type=int, default=5)
+parser.add_argument(
+    "--egl", action="store_true", help="render off screen through EGL, no display"
+)
+parser.add_argument("--once", action="store_true", help=argparse.SUPPRESS)
+args = parser.parse_args()
+
+if args.once:
+    print(json.dumps(run_once(args.egl)))
+    sys.exit()
+
+command = [sys.executable, os.path.abspath(__file__), "--once"]
+if args.egl:
+    command.append("--egl")
+
+runs = []
+for _ in range(args.repeat):
+    output = subprocess.run(
+        command, cwd=ROOT, check=True, capture_output=True, text=True
+    ).stdout
+    runs.append(json.loads(output.strip().splitlines()[-1]))
+
+for phase in runs[0]:
+    durations = sorted(run[phase] for run in runs)
+    median = durations[len(durations) // 2] * 1000
+    print(f"{phase:>12}: median {median:8.1f} ms, best {durations[0] * 1000:8.1f} ms")
@@ -0,0 +1,111 @@
+"""Times the ship's trajectory forecast through a headless race.
+
+The ship thrusts while turning a little every so often, so the forecast is
+kept and extended for most steps and rebuilt now and then. The time spent
+keeping it up each step is compared with rebuilding the whole horizon
+every step, and the forecast is checked against where the ship really
+went, over stretches where it neither turned nor bounced.
+
+Run from the repository root:
+
+    python benchmarks/trajectory.py --map speedy_map --turn-every 30
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument("--map", default="speedy_map")
+parser.add_argument("--steps", type=int, default=1200)
+parser.add_argument("--turn-every", type=int, default=30, help="steps between turns")
+parser.add_argument("--horizon", type=float, default=4.0, help="seconds")
+args = parser.parse_args()
+
+from game import physics_system as physics_system_module
+from game.headless import Simulation
+
+sim = Simulation(args.map, mode="freeplay", save_records=False)
+physics_system = sim.world.systems["PhysicsSystem"]
+ship = sim.ship
+trajectory = ship["trajectory"]
+trajectory.horizon = args.horizon
+
+durations = []
+update_trajectory = physics_system.update_trajectory
+
+
+def timed():
+    start = time.perf_counter()
+    update_trajectory()
+    durations.append(time.perf_counter() - start)
+
+
+physics_system.update_trajectory = timed
+
+# Step -> forecast made then, checked once the ship has flown it
+forecasts = {}
+actual = {}
+turns = set()
+rotation = ship["physics"].rotation
+for step in range(args.steps):
+    if step and step % args.turn_every == 0:
+        rotation += 10.0
+        turns.add(step)
+    sim.step(w=True, aim=rotation)
+    actual[step] = ship["physics"].position
+    forecasts[step] = trajectory.positions()
+
+
+def ms(values):
+    values = sorted(values)
+    return (
+        f"median {values[len(values) // 2] * 1000:.3f} ms, "
+        f"p99 {values[int(len(values) * 0.99)] * 1000:.3f} ms"
+    )
+
+
+print(f"{args.steps} steps on {args.map}, turning every {args.turn_every}")
+print(f"kept up incrementally: {ms(durations)}")
+
+# The same forecast built from scratch every step, all in one go
+physics_system_module.STEPS_PER_UPDATE = 10**9
+full = []
+for _ in range(50):
+    trajectory.assumed = None
+    start = time.perf_counter()
+    update_trajectory()
+    full.append(time.perf_counter() - start)
+print(f"rebuilt every step:     {ms(full)}")
+
+# Steps the ship didn't go where the forecast before them said, after a
+# turn or a bounce off a collider
+missed = set()
+for step in range(1, args.steps):
+    forecast = forecasts[step - 1]
+    if not forecast or (forecast[0] - actual[step]).length > 1e-6:
+        missed.add(step)
+print(
+    f"forecast followed on {args.steps - 1 - len(missed)} of {args.steps - 1} steps, "
+    f"{len(turns)} turns, {len(missed - turns)} other misses"
+)
+
+# Forecast error over stretches the ship followed it, at a few distances
+# ahead. The forecast steps the same way the physics does, so it should be
+# next to nothing.
+for ahead in (30, 120, round(args.horizon * 60)):
+    errors = []
+    for step, forecast in forecasts.items():
+        target = step + ahead
+        if target not in actual or len(forecast) < ahead:
+            continue
+        if missed.intersection(range(step + 1, target + 1)):
+            continue
+        errors.append((forecast[ahead - 1] - actual[target]).length)
+    if errors:
+        print(
+            f"{ahead / 60:.1f} s ahead: worst error {max(errors):.2e} units "
+            f"over {len(errors)} forecasts"
+        )
@@ -1 +1,6 @@
-from .game import run_game
+def run_game(*args, **kwargs):
+    # Imported on first use, so the simulation modules can be imported
+    # without opening a window, e.g. to run headless
+    from .game import run_game
+
+    return run_game(*args, **kwargs)
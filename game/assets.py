@@ -1 +1,26 @@
-ASSETS = {}
+class Assets(dict):
+    """Asset name -> asset, each loaded the first time it is looked up
+
+    ASSETS.register("moon", load_image, "moon-128x128.png")
+    sprite = pyglet.sprite.Sprite(ASSETS["moon"])
+    """
+
+    def __init__(self):
+        super().__init__()
+        # Asset name -> (loader, args, kwargs)
+        self.loaders = {}
+        # Handed out in place of every asset when nothing is drawn or played
+        self.stand_in = None
+
+    def register(self, name, loader, *args, **kwargs):
+        self.loaders[name] = (loader, args, kwargs)
+
+    def __missing__(self, name):
+        if self.stand_in is not None:
+            return self.stand_in
+        loader, args, kwargs = self.loaders[name]
+        asset = self[name] = loader(*args, **kwargs)
+        return asset
+
+
+ASSETS = Assets()
@@ -7,17 +7,30 @@ from .components import AudioComponent
 from .common import *
 
 class AudioSystem(System):
+    reads = ("input", "ship", "map")
+    writes = ("audio",)
+
     def setup(self):
         self.subscribe("PlayFX", self.handle_fx)
+        # Sound effects go after gameplay events, and repeats of the same
+        # effect within one sync point play once at the loudest volume
+        self.set_priority("PlayFX", 10)
+        self.coalesce(
+            "PlayFX",
+            key=lambda *, fx, **kwargs: fx,
+            merge=lambda pending, new: {
+                "volume": max(pending.get("volume", 1.0), new.get("volume", 1.0))
+            },
+        )
         entity = Entity()
         entity.attach(AudioComponent())
 
     def update(self):
         if not settings.audio:
             return
-        inputs = get_inputs()
-        ship_entity = get_ship_entity()
-        ship = ship_entity['ship']
+        frame = self.world.frame
+        inputs = frame.input["input"]
+        ship = frame.ship['ship']
         thrusting = (inputs.w and map_is_active())
 
         if ship.boosting:
@@ -32,7 +45,7 @@ class AudioSystem(System):
 
     @property
     def audio(self):
-        return Entity.with_component("audio")[0]['audio']
+        return self.world.singleton("audio")['audio']
 
     def start_loop(self, fx, volume=1.0):
         if not settings.audio:
@@ -0,0 +1,210 @@
+import numpy as np
+
+from .gravity import clamp, pull
+from .vector import V2
+
+# "verlet" is velocity Verlet, which samples gravity twice a step but drifts
+# far less in close flybys. "euler" steps velocity, then position with the
+# new velocity (symplectic Euler), and is best left without sub-steps: a
+# change of step size mid flight shifts its half step lead in position.
+# Euler without sub-steps is how the game has always stepped, and what the
+# personal bests in records/ were set with. Switching to "verlet" with
+# sub-steps changes how every map flies, so times set with it aren't
+# comparable with those records.
+INTEGRATOR = "euler"
+# Pull above which a body counts as near a mass and may be sub-stepped
+SUBSTEP_GRAVITY = 0.02
+# Furthest a body near a mass moves in one sub-step
+SUBSTEP_DISTANCE = 20.0
+# 1 turns sub-stepping off, 8 suits "verlet"
+MAX_SUBSTEPS = 1
+
+
+class Bodies:
+    """Struct-of-arrays copy of the physics of every dynamic body
+
+    Integration runs over NumPy arrays in one batched pass, however many
+    bodies there are. PhysicsComponent stays the source of truth: before a
+    step, rows are gathered from components that something else wrote
+    since the last step, and afterwards the results are written back.
+
+    bodies = Bodies(world)
+    bodies.gather()
+    bodies.integrate(time_factor, gravity, max_grav_acc)
+    bodies.scatter()
+
+    With a GravityGrid baked for the static masses, their pull is sampled
+    from it rather than summed:
+
+    bodies.integrate(time_factor, gravity, max_grav_acc, grid)
+    """
+
+    def __init__(self, world):
+        self.world = world
+        self.query = world.query("physics", "dynamic")
+        self.everything = world.query("physics")
+        # (positions, masses) of the static masses, None until next needed.
+        # Bodies only start or stop being static masses by having physics
+        # or dynamic attached or removed.
+        self.statics = None
+        for name in ("physics", "dynamic"):
+            world.on_attach(name, self.forget_static_masses)
+            world.on_remove(name, self.forget_static_masses)
+        # Row -> entity
+        self.entities = []
+        self.position = np.zeros((0, 2))
+        self.velocity = np.zeros((0, 2))
+        self.acceleration = np.zeros((0, 2))
+        self.drag = np.zeros(0)
+        # Change tick right after the latest scatter, later changes to a
+        # body's physics came from elsewhere and need gathering again
+        self.synced_tick = -1
+    def __len__(self):
+        return len(self.entities)
+
+    def gather(self):
+        entities = list(self.query)
+        pruned = self.synced_tick < self.world.pruned_tick
+        if entities != self.entities or pruned:
+            # Bodies were added or removed, or changes made since the last
+            # scatter may have been forgotten, so rebuild every row
+            self.entities = entities
+            n = len(entities)
+            self.position = np.empty((n, 2))
+            self.velocity = np.empty((n, 2))
+            self.acceleration = np.empty((n, 2))
+            self.drag = np.empty(n)
+            rows = range(n)
+        else:
+            has_changed = self.world.has_changed
+            rows = [
+                row
+                for row, entity in enumerate(entities)
+                if has_changed(entity, "physics", self.synced_tick)
+            ]
+
+        for row in rows:
+            physics = self.entities[row]["physics"]
+            self.position[row] = physics.position.x, physics.position.y
+            self.velocity[row] = physics.velocity.x, physics.velocity.y
+            self.acceleration[row] = physics.acceleration.x, physics.acceleration.y
+            self.drag[row] = physics.drag_constant
+
+    def scatter(self):
+        for row, entity in enumerate(self.entities):
+            physics = entity["physics"]
+            physics.position = V2(*self.position[row])
+            physics.velocity = V2(*self.velocity[row])
+            physics.acceleration = V2(*self.acceleration[row])
+        self.synced_tick = self.world.change_tick
+
+    def static_masses(self):
+        """Returns positions and masses of every body with mass that doesn't
+        move, found once and kept until a body is added or removed"""
+        if self.statics is None:
+            positions = []
+            masses = []
+            for entity in self.everything:
+                physics = entity["physics"]
+                if physics.mass != 0.0 and entity["dynamic"] is None:
+                    positions.append((physics.position.x, physics.position.y))
+                    masses.append(physics.mass)
+            self.statics = np.array(positions).reshape(-1, 2), np.array(masses)
+        return self.statics
+
+    def forget_static_masses(self, entity=None, component=None):
+        self.statics = None
+
+    def moving_masses(self):
+        "Returns positions and masses of the bodies that have mass"
+        positions = []
+        masses = []
+        for row, entity in enumerate(self.entities):
+            mass = entity["physics"].mass
+            if mass != 0.0:
+                positions.append(self.position[row])
+                masses.append(mass)
+        return np.array(positions).reshape(-1, 2), np.array(masses)
+
+    def static_pull(self, positions, gravity, max_grav_acc, grid, statics):
+        "Pull of the static masses at positions, from grid where it covers them"
+        if grid is None:
+            return pull(positions, *statics, gravity)
+        sampled, inside = grid.sample(positions)
+        if not inside.all():
+            # Bodies that left the grid get the static pull summed
+            outside = ~inside
+            sampled[outside] = clamp(
+                pull(positions[outside], *grid.masses, gravity), max_grav_acc
+            )
+        return sampled
+
+    def substeps(self, grav_acc, time_factor):
+        """Sub-steps each body takes, more for fast bodies near a mass and
+        a single one in open space"""
+        if MAX_SUBSTEPS == 1:
+            return np.ones(len(self), dtype=int)
+        speed = np.hypot(self.velocity[:, 0], self.velocity[:, 1])
+        steps = np.ceil(speed * time_factor / SUBSTEP_DISTANCE)
+        near = np.hypot(grav_acc[:, 0], grav_acc[:, 1]) > SUBSTEP_GRAVITY
+        return np.where(near, np.clip(steps, 1, MAX_SUBSTEPS), 1).astype(int)
+
+    def integrate(self, time_factor, gravity, max_grav_acc, grid=None):
+        """Adds gravity to the acceleration, clamped to max_grav_acc, then
+        applies drag and steps velocity and position with INTEGRATOR.
+
+        The static pull comes from grid when given, for bodies inside it,
+        and is sampled again at every sub-step. The bodies' own pull on
+        each other is taken once, at the start of the step."""
+        thrust = self.acceleration.copy()
+        grav_acc = np.zeros_like(thrust)
+        moving = np.zeros_like(thrust)
+        statics = None
+        if gravity:
+            if grid is None:
+                statics = self.static_masses()
+            moving = pull(self.position, *self.moving_masses(), gravity)
+            grav_acc = clamp(
+                moving
+                + self.static_pull(
+                    self.position, gravity, max_grav_acc, grid, statics
+                ),
+                max_grav_acc,
+            )
+        # The acceleration written back is the one at the start of the step
+        self.acceleration += grav_acc
+
+        def sample(rows, positions):
+            if not gravity:
+                return grav_acc[rows]
+            return clamp(
+                moving[rows]
+                + self.static_pull(positions, gravity, max_grav_acc, grid, statics),
+                max_grav_acc,
+            )
+
+        substeps = self.substeps(grav_acc, time_factor)
+        h = (time_factor / substeps)[:, np.newaxis]
+        rows = np.arange(len(self))
+        for k in range(substeps.max(initial=0)):
+            if k:
+                # Only bodies with sub-steps left carry on
+                rows = rows[substeps[rows] > k]
+                if INTEGRATOR == "euler":
+                    grav_acc[rows] = sample(rows, self.position[rows])
+            step = h[rows]
+            velocity = self.velocity[rows] * (1 - self.drag[rows, np.newaxis] * step)
+            acceleration = thrust[rows] + grav_acc[rows]
+            if INTEGRATOR == "verlet":
+                position = (
+                    self.position[rows]
+                    + velocity * step
+                    + 0.5 * acceleration * step * step
+                )
+                grav_acc[rows] = sample(rows, position)
+                velocity += 0.5 * (acceleration + thrust[rows] + grav_acc[rows]) * step
+            else:
+                velocity += acceleration * step
+                position = self.position[rows] + velocity * step
+            self.velocity[rows] = velocity
+            self.position[rows] = position
@@ -1,6 +1,7 @@
 import pyglet
 
-from .ecs import Entity
+from .ecs import Entity, World
+from .pool import POOL
 from .components import (
     GameVisualComponent,
     Visual,
@@ -10,42 +11,50 @@ from .components import (
 from .vector import V2
 
 
+# Components that only ever live on one entity at a time. The world keeps
+# track of their owners so the lookups below don't have to search for them.
+SINGLETON_COMPONENTS = ("input", "window", "ship", "map", "audio")
+
+for component_name in SINGLETON_COMPONENTS:
+    Entity.world.register_singleton(component_name)
+
+
+def create_world():
+    "Makes a new, isolated world that knows the game's singleton components"
+    return World(singletons=SINGLETON_COMPONENTS)
+
+
 def get_inputs():
-    inputs = Entity.with_component("input")
-    if len(inputs) == 0:
+    entity = Entity.world.singleton("input")
+    if entity is None:
         return None
     else:
-        return inputs[0]["input"]
+        return entity["input"]
 
 
 def get_window():
-    windows = Entity.with_component("window")
-    if len(windows) == 0:
+    entity = Entity.world.singleton("window")
+    if entity is None:
         return None
     else:
-        return windows[0]["window"]
+        return entity["window"]
 
 
 def get_ship_entity():
-    ships = Entity.with_component("ship")
-    if len(ships) == 0:
-        return None
-    else:
-        return ships[0]
+    return Entity.world.singleton("ship")
 
 
 def get_active_map_entity():
-    map_entities = Entity.with_component("map")
-    for map_entity in map_entities:
-        if map_entity["map"].is_active:
-            return map_entity
+    map_entity = Entity.world.singleton("map")
+    if map_entity is not None and map_entity["map"].is_active:
+        return map_entity
     return None
 
 
 def create_sprite(position, rotation, image, scale=1.0, subpixel=True, z_sort=0.0):
     entity = Entity()
     entity.attach(PhysicsComponent(position=position, rotation=rotation))
-    sprite = pyglet.sprite.Sprite(image, x=position.x, y=position.y, subpixel=subpixel)
+    sprite = POOL.sprite(image, x=position.x, y=position.y, subpixel=subpixel)
     sprite.scale = scale
     sprite.rotation = rotation
     entity.attach(
@@ -82,6 +91,6 @@ def reset_ship_physics():
     physics = entity['physics']
     ship.boost = 100
     ship.boosting = False
-    physics.acceletion = V2(0, 0)
+    physics.acceleration = V2(0, 0)
     physics.velocity = V2(0, 0)
 
@@ -1,25 +1,31 @@
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_right
+from collections import deque
 from dataclasses import dataclass, field
 
 import pyglet
 
 from . import ecs
+from .particles import Particles
 from .vector import V2
 
 
-@dataclass
+@dataclass(slots=True)
 class Visual:
     kind: str
     z_sort: float
     value: object
 
 
-@dataclass
+@dataclass(slots=True)
 class GameVisualComponent:
     component_name: str = "game visual"
     visuals: list[Visual] = field(default_factory=list)
 
 
-@dataclass
+@dataclass(slots=True)
 class UIVisualComponent:
     component_name: str = "ui visual"
     visuals: list[Visual] = field(default_factory=list)
@@ -27,7 +33,7 @@ class UIVisualComponent:
     right: float = None
 
 
-@dataclass
+@dataclass(slots=True)
 class InputComponent:
     component_name: str = "input"
     w: bool = False
@@ -39,8 +45,8 @@ class InputComponent:
     placement: bool = False
 
 
-@dataclass
-class PhysicsComponent:
+@dataclass(slots=True)
+class PhysicsComponent(ecs.Tracked):
     component_name: str = "physics"
     position: V2 = field(default_factory=V2)
     rotation: float = 0.0
@@ -49,10 +55,19 @@ class PhysicsComponent:
     acc_constant: float = 0.25
     drag_constant: float = 0.015
     mass: float = 0.0
-    static: bool = True
+    # State before the latest fixed step, used to interpolate rendering.
+    # None renders the current state as is, e.g. right after a teleport.
+    previous_position: V2 = None
+    previous_rotation: float = None
+
+
+@dataclass(slots=True)
+class DynamicComponent:
+    # Marks physics bodies that move, everything else stays where it is put
+    component_name: str = "dynamic"
 
 
-@dataclass
+@dataclass(slots=True)
 class ShipComponent:
     component_name: str = "ship"
     boost: float = 100.0
@@ -60,7 +75,22 @@ class ShipComponent:
     boost_constant: float = 1.75
 
 
-@dataclass
+@dataclass(slots=True)
+class TrajectoryComponent:
+    component_name: str = "trajectory"
+    # Seconds of flight to predict
+    horizon: float = 4.0
+    # (x, y, vx, vy) after each fixed step ahead, the next one first, for
+    # the inputs held now. Colliders are ignored, a bounce rebuilds it.
+    states: deque = field(default_factory=deque)
+    # What the forecast was made under, it is rebuilt once that changes
+    assumed: tuple = None
+
+    def positions(self):
+        return [V2(x, y) for x, y, _, _ in self.states]
+
+
+@dataclass(slots=True)
 class CheckpointComponent:
     component_name: str = "checkpoint"
     next_image_bottom: pyglet.image.AbstractImage = None
@@ -75,22 +105,23 @@ class CheckpointComponent:
     map_entity_id: int = None
 
 
-@dataclass
+@dataclass(slots=True)
 class WindowComponent:
     window: pyglet.window.Window
     component_name: str = "window"
     camera_position: V2 = V2(0.0, 0.0)
+    previous_camera_position: V2 = None
     camera_zoom: float = 1.5
     background_layers: list = field(default_factory=list)
 
 
-@dataclass
+@dataclass(slots=True)
 class Emitter:
     image: pyglet.image.AbstractImage
     # A sprite batch to draw all of the emitted particles
     batch: pyglet.graphics.Batch
-    # A list of sprites that have been emitted
-    sprites: list[pyglet.sprite.Sprite] = field(default_factory=list)
+    # The emitted particles, set up by the first update that emits one
+    particles: Particles = None
     # time between each particle
     rate: float = 1.0
     # records last time particle was emitted
@@ -99,19 +130,63 @@ class Emitter:
     enabled: bool = True
 
 
-@dataclass
+@dataclass(slots=True)
 class EmitterBoost(Emitter):
     boost_image: pyglet.image.AbstractImage = None
 
 
-@dataclass
+@dataclass(slots=True)
 class FlightPathComponent:
     component_name: str = "flight path"
     path: list[V2] = field(default_factory=list)
     flares: list[pyglet.sprite.Sprite] = field(default_factory=list)
 
 
-@dataclass
+class RacingLine:
+    """Points of a racing line kept column-wise in flat arrays of doubles
+
+    A point is recorded every 50 units of a race, so lines are long. They
+    are saved as a list of {"x", "y", "r", "dt"} dicts, see points().
+    """
+
+    __slots__ = ("x", "y", "r", "dt")
+
+    def __init__(self, points=()):
+        self.x = array("d")
+        self.y = array("d")
+        self.r = array("d")
+        # Seconds since the race started, never decreasing
+        self.dt = array("d")
+        for p in points:
+            self.append(p["x"], p["y"], p["r"], p["dt"])
+
+    def __len__(self):
+        return len(self.dt)
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}: {len(self)} points>"
+
+    def append(self, x, y, r, dt):
+        self.x.append(x)
+        self.y.append(y)
+        self.r.append(r)
+        self.dt.append(dt)
+
+    def position(self, i):
+        return V2(self.x[i], self.y[i])
+
+    def index_after(self, dt):
+        "Index of the first point recorded after dt, len(self) if none was"
+        return bisect_right(self.dt, dt)
+
+    def points(self):
+        return [
+            {"x": x, "y": y, "r": r, "dt": dt}
+            for x, y, r, dt in zip(self.x, self.y, self.r, self.dt)
+        ]
+
+
+@dataclass(slots=True)
 class MapComponent:
     component_name: str = "map"
 
@@ -152,10 +227,10 @@ class MapComponent:
     race_end_time: float = None
 
     # Stores the flight path/racing line during a race
-    racing_line: list[dict] = field(default_factory=list)
+    racing_line: RacingLine = field(default_factory=RacingLine)
 
     # Stores the personal best racing line
-    pb_racing_line: list[dict] = field(default_factory=list)
+    pb_racing_line: RacingLine = field(default_factory=RacingLine)
 
     # Stores the personal best ghost entity ID
     pb_ghost_entity_id: int = None
@@ -163,8 +238,12 @@ class MapComponent:
     # Stores the personal best racing line entity ID
     pb_line_entity_id: int = None
 
+    # World snapshot taken once the map finished loading, restored to
+    # restart the race without reloading the map
+    restart_snapshot: bytes = None
+
 
-@dataclass
+@dataclass(slots=True)
 class CountdownComponent:
     component_name: str = "countdown"
 
@@ -184,14 +263,14 @@ class CountdownComponent:
     last_evaluated: float = None
 
 
-@dataclass
+@dataclass(slots=True)
 class CollisionComponent:
     component_name = "collision"
     collider_shape: str = "circle"
     circle_radius: float = 0.0
 
 
-@dataclass
+@dataclass(slots=True)
 class MenuComponent:
     component_name: str = "menu"
     menu_name: str = ""
@@ -201,7 +280,7 @@ class MenuComponent:
     displayed: bool = False
 
 
-@dataclass
+@dataclass(slots=True)
 class AudioComponent:
     component_name: str = "audio"
     fx_volume: float = 0.5
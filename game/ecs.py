@@ -1,19 +1,605 @@
-DELTA_TIME = 0.01667
-NEXT_ENTITY = 1
+from contextlib import contextmanager
+from heapq import heappush, heappop
+from itertools import count
+from time import perf_counter
 
+from .profiling import PROFILER
+
+
+# Entity ids pack a slot index into the low bits and the slot's
+# generation above it, so ids of destroyed entities never match again
+INDEX_BITS = 24
+INDEX_MASK = (1 << INDEX_BITS) - 1
+
+# Every fixed step system advances the simulation by exactly this much
+FIXED_DELTA_TIME = 1 / 60
+# Longest frame the simulation will catch up on, anything past it is dropped
+MAX_FRAME_TIME = 0.25
+
+
+class Archetype:
+    """Table holding every entity that has exactly the same set of components
+
+    Each component name gets its own column and row ``i`` of every column
+    belongs to ``entities[i]``, so a signature can be walked without
+    building any intermediate lists.
+    """
+
+    def __init__(self, signature):
+        self.signature = signature
+        self.entities = []
+        self.columns = {name: [] for name in signature}
+        # Caches of component name -> archetype reached by adding or
+        # removing that component
+        self.add_edges = {}
+        self.remove_edges = {}
+
+    def __len__(self):
+        return len(self.entities)
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}: {sorted(self.signature)} x{len(self)}>"
+
+    def append(self, entity, components):
+        row = len(self.entities)
+        self.entities.append(entity)
+        for name, column in self.columns.items():
+            column.append(components[name])
+        return row
+
+    def remove(self, row):
+        """Removes a row by swapping the last row into its place.
+        Returns the components that lived in the removed row."""
+        last = len(self.entities) - 1
+        components = {}
+        for name, column in self.columns.items():
+            components[name] = column[row]
+            column[row] = column[last]
+            column.pop()
+        moved = self.entities[last]
+        self.entities[row] = moved
+        self.entities.pop()
+        moved.row = row
+        return components
+
+
+class Query:
+    """Live view over every entity that has all of the requested components
+
+    The view keeps a list of the matching archetypes and the world adds new
+    archetypes to it as they are created, so iterating it never rebuilds
+    anything. Entities waiting on destruction are skipped.
+    """
+
+    def __init__(self, world, component_names):
+        self.world = world
+        self.component_names = component_names
+        self.archetypes = []
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}: {sorted(self.component_names)}>"
+
+    def __iter__(self):
+        for archetype in self.archetypes:
+            for entity in archetype.entities:
+                if not entity.destroyed:
+                    yield entity
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __bool__(self):
+        return self.first() is not None
+
+    def first(self):
+        for entity in self:
+            return entity
+        return None
+
+    def columns(self, *component_names):
+        """Iterates tuples of the named components for each matching entity
+
+        for physics, collision in query.columns("physics", "collision"):
+            ...
+        """
+        for archetype in self.archetypes:
+            columns = [archetype.columns[name] for name in component_names]
+            for row, entity in enumerate(archetype.entities):
+                if not entity.destroyed:
+                    yield tuple(column[row] for column in columns)
+
+    def changed(self, component_name, since):
+        """Iterates matching entities whose component changed after the
+        change tick ``since``, usually the system's own last_run
+
+        for entity in query.changed("physics", self.last_run):
+            ...
+        """
+        for entity in self.world.changed(component_name, since):
+            if self.component_names <= entity.archetype.signature:
+                yield entity
+
+
+class Tracked:
+    """Component mixin that reports attribute writes to the owning world
+
+    Assigning to an attribute of an attached component marks it changed
+    for World.changed and Query.changed. Mutating a value in place, such
+    as appending to a list, is not seen, assign a new value instead.
+    """
+
+    # Entity the component is attached to, set by World.attach
+    __slots__ = ("_owner",)
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        try:
+            owner = self._owner
+        except AttributeError:
+            # Still being constructed
+            return
+        if owner is not None:
+            owner.world.mark_changed(owner, self.component_name)
+
+
+class Frame:
+    """Singleton entities resolved once at the start of a tick
+
+    frame = world.frame
+    ship_entity = frame.ship
+    """
+
+    def __init__(self, singletons):
+        self.__dict__.update(singletons)
+
+    def __getattr__(self, name):
+        # Singletons that did not exist when the frame was resolved
+        return None
+
+
+class World:
+    """One independent simulation: its entities, systems and events
+
+    Entity() and System() join the active world, Entity.world. Stepping a
+    world activates it for the duration, so every world can be created and
+    run side by side in one process.
+
+    world = World()
+    with world.activated():
+        RacingSystem()
+    world.advance(dt)
+    """
+
+    def __init__(self, singletons=()):
+        # Slot index -> live entity, slot 0 is never used so ids are never 0
+        self.slots = [None]
+        # Slot index -> how many times the slot has been freed
+        self.generations = [0]
+        self.free_slots = []
+        self.archetypes = {}
+        # Component name -> list of archetypes that contain that component
+        self.component_index = {}
+        self.pending_destruction = set()
+        # Frozen set of component names -> Query
+        self.queries = {}
+        # Component names that only one entity may have at a time
+        self.singleton_names = set()
+        # Singleton component name -> owning entity
+        self.singletons = {}
+        self.frame = Frame({})
+        # Bumped on every change, so ticks order changes against system runs
+        self.change_tick = 0
+        # Component name -> {entity: tick of its latest change}
+        self.changes = {}
+        # Change tick at the start of the latest fixed step
+        self.step_tick = 0
+        # Changes at or before this tick have been forgotten
+        self.pruned_tick = 0
+        # Component name -> callbacks run as callback(entity, component)
+        # when the component leaves an entity
+        self.removal_hooks = {}
+        # Component name -> callbacks run when one is attached
+        self.attach_hooks = {}
+        self.empty_archetype = self.archetype(frozenset())
+        for component_name in singletons:
+            self.register_singleton(component_name)
+
+        # System name -> system, run in this order
+        self.systems = {}
+        # Event name -> list of (system, handler)
+        self.subscriptions = {}
+        # Event name -> system classes built the first time it is dispatched
+        self.lazy_systems = {}
+        self.events = EventQueue()
+        self.draining = False
+        self.scheduler = Scheduler()
+        # Seconds covered by the systems' current update
+        self.delta_time = FIXED_DELTA_TIME
+        # Frame time not yet consumed by fixed steps
+        self.accumulator = 0.0
+        # How far the rendered frame is between the last two simulation states
+        self.interpolation_alpha = 1.0
+        # Simulation seconds so far, read instead of the wall clock so race
+        # times only depend on the steps taken
+        self.clock = 0.0
+        # One fixed step per frame, see make_deterministic
+        self.deterministic = False
+
+    def make_deterministic(self):
+        """Runs exactly one fixed step per frame, whatever the frame time.
+        Systems always run stage by stage in the scheduler's order, which
+        only depends on the systems registered and their declared
+        components, so the same inputs then give bit identical runs."""
+        self.deterministic = True
+
+    def activate(self):
+        "Makes this the world that Entity() and System() join"
+        Entity.world = self
+
+    @contextmanager
+    def activated(self):
+        previous = Entity.world
+        self.activate()
+        try:
+            yield self
+        finally:
+            Entity.world = previous
+
+    def archetype(self, signature):
+        archetype = self.archetypes.get(signature)
+        if archetype is None:
+            archetype = Archetype(signature)
+            self.archetypes[signature] = archetype
+            for name in signature:
+                self.component_index.setdefault(name, []).append(archetype)
+            for query in self.queries.values():
+                if query.component_names <= signature:
+                    query.archetypes.append(archetype)
+        return archetype
+
+    def query(self, *component_names):
+        """Returns the cached live view of entities with all the components
+
+        colliders = world.query("physics", "collision")
+        """
+        key = frozenset(component_names)
+        query = self.queries.get(key)
+        if query is None:
+            query = Query(self, key)
+            query.archetypes = [
+                archetype
+                for signature, archetype in self.archetypes.items()
+                if key <= signature
+            ]
+            self.queries[key] = query
+        return query
+
+    def register_singleton(self, component_name):
+        self.singleton_names.add(component_name)
+        for entity in self.each(component_name):
+            if not entity.destroyed:
+                self.singletons[component_name] = entity
+
+    def singleton(self, component_name):
+        "Returns the entity owning a singleton component, or None"
+        return self.singletons.get(component_name)
+
+    def resolve_frame(self):
+        self.frame = Frame(self.singletons)
+        return self.frame
+
+    def spawn(self, entity):
+        if self.free_slots:
+            index = self.free_slots.pop()
+        else:
+            index = len(self.slots)
+            assert index <= INDEX_MASK, "Ran out of entity slots"
+            self.slots.append(None)
+            self.generations.append(0)
+        self.slots[index] = entity
+        entity.entity_id = (self.generations[index] << INDEX_BITS) | index
+        entity.archetype = self.empty_archetype
+        entity.row = self.empty_archetype.append(entity, {})
+
+    def attach(self, entity, component):
+        name = component.component_name
+        archetype = entity.archetype
+
+        # Replacing a component keeps the entity in the same table
+        if isinstance(component, Tracked):
+            object.__setattr__(component, "_owner", entity)
+        self.mark_changed(entity, name)
+
+        column = archetype.columns.get(name)
+        if column is not None:
+            previous = column[entity.row]
+            column[entity.row] = component
+            if previous is not component:
+                self.untrack(previous)
+                self.removed(entity, previous)
+                self.attached(entity, component)
+            return
+
+        target = archetype.add_edges.get(name)
+        if target is None:
+            target = self.archetype(archetype.signature | {name})
+            archetype.add_edges[name] = target
+
+        if name in self.singleton_names:
+            owner = self.singletons.get(name)
+            assert owner is None or owner is entity, (
+                f"{entity} cannot have singleton component {name!r}, "
+                f"{owner} already has one"
+            )
+            self.singletons[name] = entity
+
+        components = archetype.remove(entity.row)
+        components[name] = component
+        entity.archetype = target
+        entity.row = target.append(entity, components)
+        self.attached(entity, component)
+
+    def detach(self, entity, component_name):
+        "Removes a component from the entity and returns it, or None"
+        archetype = entity.archetype
+        if component_name not in archetype.columns:
+            return None
+
+        target = archetype.remove_edges.get(component_name)
+        if target is None:
+            target = self.archetype(archetype.signature - {component_name})
+            archetype.remove_edges[component_name] = target
+
+        if self.singletons.get(component_name) is entity:
+            del self.singletons[component_name]
+
+        components = archetype.remove(entity.row)
+        component = components.pop(component_name)
+        entity.archetype = target
+        entity.row = target.append(entity, components)
+        self.untrack(component)
+        self.changes.get(component_name, {}).pop(entity, None)
+        self.removed(entity, component)
+        return component
+
+    def replace(self, entity, component):
+        "Swaps in a component in place and returns the one it replaced, or None"
+        previous = entity[component.component_name]
+        self.attach(entity, component)
+        return previous
+
+    def on_remove(self, component_name, callback):
+        """Runs callback(entity, component) whenever the component leaves an
+        entity: detached, replaced, or its entity destroyed"""
+        self.removal_hooks.setdefault(component_name, []).append(callback)
+
+    def removed(self, entity, component):
+        for callback in self.removal_hooks.get(component.component_name, ()):
+            callback(entity, component)
+
+    def on_attach(self, component_name, callback):
+        """Runs callback(entity, component) whenever the component is
+        attached to an entity, replacing one included"""
+        self.attach_hooks.setdefault(component_name, []).append(callback)
+
+    def attached(self, entity, component):
+        for callback in self.attach_hooks.get(component.component_name, ()):
+            callback(entity, component)
+
+    @staticmethod
+    def untrack(component):
+        if isinstance(component, Tracked):
+            object.__setattr__(component, "_owner", None)
+
+    def mark_changed(self, entity, component_name):
+        self.change_tick += 1
+        changes = self.changes.get(component_name)
+        if changes is None:
+            changes = self.changes[component_name] = {}
+        changes[entity] = self.change_tick
+
+    def changed(self, component_name, since):
+        "Iterates entities whose component changed after the change tick since"
+        changes = self.changes.get(component_name)
+        if not changes:
+            return
+        for entity, tick in list(changes.items()):
+            if tick > since and not entity.destroyed:
+                yield entity
+
+    def has_changed(self, entity, component_name, since):
+        changes = self.changes.get(component_name, {})
+        return changes.get(entity, 0) > since
+
+    def prune_changes(self):
+        "Forgets changes that every system has already run after"
+        # Systems that are never scheduled never see a change
+        seen = min(
+            (s.last_run for s in self.systems.values() if s.scheduled),
+            default=self.change_tick,
+        )
+        seen = min(seen, self.step_tick)
+        self.pruned_tick = seen
+        for changes in self.changes.values():
+            stale = [entity for entity, tick in changes.items() if tick <= seen]
+            for entity in stale:
+                del changes[entity]
+
+    def destroy(self, entity):
+        if entity.destroyed:
+            return
+        entity.destroyed = True
+        self.pending_destruction.add(entity)
+        for name in entity.archetype.signature & self.singleton_names:
+            if self.singletons.get(name) is entity:
+                del self.singletons[name]
+        # Hooks run now rather than at cleanup, so whatever they free can be
+        # reused by entities created before the next sync point
+        if self.removal_hooks:
+            for component in entity.components.values():
+                self.removed(entity, component)
+
+    def find(self, entity_id):
+        if entity_id is None:
+            return None
+        index = entity_id & INDEX_MASK
+        if index >= len(self.slots):
+            return None
+        entity = self.slots[index]
+        if entity is None or entity.entity_id != entity_id:
+            return None
+        return entity
+
+    def free(self, entity):
+        index = entity.index
+        self.slots[index] = None
+        self.generations[index] += 1
+        self.free_slots.append(index)
+
+    def with_component(self, component_name):
+        entities = []
+        for archetype in self.component_index.get(component_name, ()):
+            entities.extend(archetype.entities)
+        return entities
+
+    def each(self, component_name):
+        "Iterates every entity with the component, straight from the tables"
+        for archetype in self.component_index.get(component_name, ()):
+            yield from archetype.entities
+
+    def components(self, component_name):
+        "Iterates every instance of a component, straight from the columns"
+        for archetype in self.component_index.get(component_name, ()):
+            yield from archetype.columns[component_name]
+
+    def clean_pending_destruction(self):
+        for entity in self.pending_destruction:
+            if self.find(entity.entity_id) is not entity:
+                continue
+            components = entity.archetype.remove(entity.row)
+            # Keep components readable through stale references to the entity
+            detached = Archetype(entity.archetype.signature)
+            entity.archetype = detached
+            entity.row = detached.append(entity, components)
+            self.free(entity)
+            for changes in self.changes.values():
+                changes.pop(entity, None)
+        self.pending_destruction = set()
+
+
+    def add_system(self, system):
+        self.systems[system.name] = system
+
+    def add_lazy_system(self, system_class, *events):
+        "Builds the system the first time any of the events is dispatched"
+        for event in events:
+            self.lazy_systems.setdefault(event, []).append(system_class)
+
+    def build_lazy_systems(self, event):
+        for system_class in self.lazy_systems.pop(event):
+            # Already built by another of its events
+            if system_class.__name__ not in self.systems:
+                system_class(self)
+
+    def subscribe(self, system, event, handler):
+        if event not in self.subscriptions:
+            self.subscriptions[event] = []
+        self.subscriptions[event].append((system, handler))
+
+    def dispatch(self, event, **kwargs):
+        "Queues an event for the next sync point"
+        self.events.push(event, kwargs)
+
+    def dispatch_now(self, event, **kwargs):
+        "Runs every handler for the event immediately"
+        if event in self.lazy_systems:
+            self.build_lazy_systems(event)
+        profiling = PROFILER.enabled
+        for subscriber, handler in self.subscriptions.get(event, []):
+            if not profiling:
+                handler(**kwargs)
+                continue
+            start = perf_counter()
+            handler(**kwargs)
+            label = f"event:{event}:{subscriber.name}.{handler.__name__}"
+            PROFILER.record(label, perf_counter() - start)
+
+    def drain_events(self):
+        """Sync point: handles queued events, including any that the
+        handlers dispatch, until the queue is empty"""
+        if self.draining:
+            return
+        self.draining = True
+        try:
+            with self.activated():
+                while self.events:
+                    event, kwargs = self.events.pop()
+                    self.dispatch_now(event, **kwargs)
+        finally:
+            self.draining = False
+
+    def run_systems(self, systems):
+        systems = [system for system in systems if system.scheduled]
+        for stage in self.scheduler.stages(systems):
+            self.scheduler.run_stage(stage)
+            self.drain_events()
+        self.clean_pending_destruction()
+
+    def update_all(self):
+        "Runs every system once using the current delta_time"
+        start = perf_counter()
+        with self.activated():
+            self.drain_events()
+            self.resolve_frame()
+            self.run_systems(self.systems.values())
+            self.clock += self.delta_time
+            self.prune_changes()
+        if PROFILER.enabled:
+            PROFILER.record("frame", perf_counter() - start)
+            PROFILER.maybe_dump()
+
+    def advance(self, frame_time):
+        """Runs as many fixed steps as the frame time covers, then every
+        per-frame system once with interpolation_alpha set for rendering"""
+        start = perf_counter()
+        fixed = [s for s in self.systems.values() if s.fixed_step]
+        per_frame = [s for s in self.systems.values() if not s.fixed_step]
+
+        with self.activated():
+            self.drain_events()
+            self.resolve_frame()
+
+            if self.deterministic:
+                frame_time = FIXED_DELTA_TIME
+                self.accumulator = 0.0
+            self.accumulator += min(frame_time, MAX_FRAME_TIME)
+            self.delta_time = FIXED_DELTA_TIME
+            while self.accumulator >= FIXED_DELTA_TIME:
+                self.step_tick = self.change_tick
+                self.run_systems(fixed)
+                self.clock += FIXED_DELTA_TIME
+                self.accumulator -= FIXED_DELTA_TIME
+
+            self.interpolation_alpha = self.accumulator / FIXED_DELTA_TIME
+            self.delta_time = frame_time
+            self.run_systems(per_frame)
+            self.prune_changes()
+
+        if PROFILER.enabled:
+            PROFILER.record("frame", perf_counter() - start)
+            PROFILER.maybe_dump()
 
 class Entity:
-    entity_index = {}
-    component_index = {}
-    pending_destruction = set()
+    # The active world, see World.activate
+    world = None
 
-    def __init__(self):
-        global NEXT_ENTITY
-        self.entity_id = NEXT_ENTITY
-        NEXT_ENTITY += 1
-        self.components = {}
-        self.entity_index[self.entity_id] = self
+    def __init__(self, world=None):
+        self.world = world or Entity.world
+        self.entity_id = None
+        self.archetype = None
+        self.row = None
         self.destroyed = False
+        self.world.spawn(self)
 
     def __hash__(self):
         return hash(self.entity_id)
@@ -22,49 +608,184 @@ class Entity:
         return self.entity_id == other.entity_id
 
     def __repr__(self):
-        return f"<{self.__class__.__name__}: {self.entity_id}>"
+        return f"<{self.__class__.__name__}: {self.index}v{self.generation}>"
+
+    @property
+    def index(self):
+        "Compact slot index, reused once the entity is destroyed"
+        return self.entity_id & INDEX_MASK
+
+    @property
+    def generation(self):
+        return self.entity_id >> INDEX_BITS
+
+    @property
+    def components(self):
+        row = self.row
+        return {
+            name: column[row] for name, column in self.archetype.columns.items()
+        }
 
     def attach(self, component):
-        self.components[component.component_name] = component
-        if component.component_name not in self.component_index:
-            self.component_index[component.component_name] = set()
-        self.component_index[component.component_name].add(self)
+        self.world.attach(self, component)
+
+    def detach(self, component_name):
+        return self.world.detach(self, component_name)
+
+    def replace(self, component):
+        return self.world.replace(self, component)
 
     @classmethod
     def with_component(cls, component_name):
-        return list(cls.component_index.get(component_name, set()))
+        return cls.world.with_component(component_name)
+
+    @classmethod
+    def each(cls, component_name):
+        return cls.world.each(component_name)
 
     @classmethod
     def find(cls, entity_id):
-        if entity_id not in cls.entity_index:
-            return None
-        else:
-            return cls.entity_index[entity_id]
+        return cls.world.find(entity_id)
 
     def __getitem__(self, attr):
-        return self.components.get(attr)
+        column = self.archetype.columns.get(attr)
+        if column is None:
+            return None
+        return column[self.row]
 
     def destroy(self):
-        self.destroyed = True
-        self.pending_destruction.add(self)
+        self.world.destroy(self)
 
     @classmethod
     def clean_pending_destruction(cls):
-        for entity in cls.pending_destruction:
-            for component_name in entity.components:
-                cls.component_index[component_name].discard(entity)
-            cls.entity_index.pop(entity.entity_id, None)
-        cls.pending_destruction = set()
+        cls.world.clean_pending_destruction()
 
 
-class System:
-    systems = {}
-    subscriptions = {}
-    later_event = []
+class EventQueue:
+    """Buffers dispatched events until the next sync point
+
+    Events come back out ordered by priority (lower first) and then in the
+    order they were dispatched. Events with a coalescing rule are merged
+    with an identical pending event instead of being queued twice.
+    """
 
     def __init__(self):
-        self.systems[self.name] = self
-        self.setup()
+        self.heap = []
+        self.sequence = count()
+        # Event name -> priority, anything missing uses 0
+        self.priorities = {}
+        # Event name -> (key function, merge function)
+        self.coalescers = {}
+        # (event, coalescing key) -> kwargs of the pending event
+        self.pending = {}
+
+    def __len__(self):
+        return len(self.heap)
+
+    def push(self, event, kwargs):
+        coalescer = self.coalescers.get(event)
+        if coalescer is not None:
+            key_fn, merge_fn = coalescer
+            key = (event, key_fn(**kwargs))
+            pending = self.pending.get(key)
+            if pending is not None:
+                pending.update(merge_fn(pending, kwargs))
+                return
+            self.pending[key] = kwargs
+        else:
+            key = None
+        priority = self.priorities.get(event, 0)
+        heappush(self.heap, (priority, next(self.sequence), event, kwargs, key))
+
+    def pop(self):
+        priority, sequence, event, kwargs, key = heappop(self.heap)
+        if key is not None:
+            del self.pending[key]
+        return event, kwargs
+
+
+class Scheduler:
+    """Groups systems into stages from the components they read and write
+
+    A system is placed in the stage after the last earlier-registered
+    system it conflicts with, so conflicting systems keep their
+    registration order. Stages run in order, their systems one after
+    another on the calling thread, and events queued by a stage are
+    handled before the next one starts.
+
+    Every system with an update either calls into pyglet, which is main
+    thread only, or writes what the next one reads, so none of them can
+    run on another thread.
+    """
+
+    def __init__(self):
+        # Tuple of system ids -> stages
+        self.cache = {}
+
+    @staticmethod
+    def conflicts(a, b):
+        # Systems that don't declare their components conflict with everything
+        if None in (a.reads, a.writes, b.reads, b.writes):
+            return True
+        a_writes, b_writes = set(a.writes), set(b.writes)
+        return bool(
+            a_writes & (set(b.reads) | b_writes) or b_writes & set(a.reads)
+        )
+
+    def stages(self, systems):
+        "Returns a list of stages, each a list of systems that can run together"
+        systems = list(systems)
+        key = tuple(id(system) for system in systems)
+        if key in self.cache:
+            return self.cache[key]
+
+        stage_of = []
+        for i, system in enumerate(systems):
+            stage = 0
+            for j in range(i):
+                if self.conflicts(systems[j], system):
+                    stage = max(stage, stage_of[j] + 1)
+            stage_of.append(stage)
+
+        stages = [[] for _ in range(max(stage_of, default=-1) + 1)]
+        for system, stage in zip(systems, stage_of):
+            stages[stage].append(system)
+
+        self.cache[key] = stages
+        return stages
+
+    @staticmethod
+    def run_system(system):
+        started = system.world.change_tick
+        if not PROFILER.enabled:
+            system.update()
+        else:
+            start = perf_counter()
+            system.update()
+            PROFILER.record(f"system:{system.name}", perf_counter() - start)
+        system.last_run = started
+
+    def run_stage(self, stage):
+        for system in stage:
+            self.run_system(system)
+
+
+class System:
+    # Component names the system's update reads and writes. None means
+    # undeclared, which orders the system against every other system.
+    reads = None
+    writes = None
+    # Fixed step systems advance the simulation in FIXED_DELTA_TIME ticks,
+    # the rest run once per rendered frame
+    fixed_step = False
+    # Change tick the latest update started at, changes after it are unseen
+    last_run = 0
+
+    def __init__(self, world=None):
+        self.world = world or Entity.world
+        self.world.add_system(self)
+        with self.world.activated():
+            self.setup()
 
     def setup(self):
         pass
@@ -73,21 +794,59 @@ class System:
     def name(self):
         return self.__class__.__name__
 
+    @property
+    def scheduled(self):
+        "Systems that only handle events have no update to run each frame"
+        return type(self).update is not System.update
+
     def subscribe(self, event, handler):
-        if event not in self.subscriptions:
-            self.subscriptions[event] = []
-        self.subscriptions[event].append((self, handler))
+        self.world.subscribe(self, event, handler)
 
-    @classmethod
-    def dispatch(cls, event, **kwargs):
-        for subscriber, handler in cls.subscriptions.get(event, []):
-            handler(**kwargs)
+    def set_priority(self, event, priority):
+        "Queued events with a lower priority are handled first"
+        self.world.events.priorities[event] = priority
+
+    def coalesce(self, event, key, merge):
+        """Merges an event into an identical one already waiting in the queue
+
+        key(**kwargs) decides which pending events are identical and
+        merge(pending_kwargs, new_kwargs) returns the updated kwargs.
+        """
+        self.world.events.coalescers[event] = (key, merge)
 
     def update(self):
         pass
 
+    # The class methods below act on the active world
+
+    @classmethod
+    def build_on(cls, *events):
+        """Builds the system once one of the events is dispatched, so systems
+        a session may never need cost nothing until then
+
+        MappingSystem.build_on("StartMapping")
+        """
+        Entity.world.add_lazy_system(cls, *events)
+
+    @classmethod
+    def dispatch(cls, event, **kwargs):
+        Entity.world.dispatch(event, **kwargs)
+
+    @classmethod
+    def dispatch_now(cls, event, **kwargs):
+        Entity.world.dispatch_now(event, **kwargs)
+
+    @classmethod
+    def drain_events(cls):
+        Entity.world.drain_events()
+
     @classmethod
     def update_all(cls):
-        for system_name, system in cls.systems.items():
-            system.update()
-        Entity.clean_pending_destruction()
+        Entity.world.update_all()
+
+    @classmethod
+    def advance(cls, frame_time):
+        Entity.world.advance(frame_time)
+
+
+World().activate()
@@ -21,6 +21,7 @@ from .vector import V2
 from .components import (
     WindowComponent,
     PhysicsComponent,
+    DynamicComponent,
     InputComponent,
     Emitter,
     EmitterBoost,
@@ -29,11 +30,14 @@ from .components import (
     UIVisualComponent,
     ShipComponent,
     CollisionComponent,
+    TrajectoryComponent,
 )
 
 # System Imports
 from .render_system import RenderSystem
 from .cartography_system import CartographySystem
+from .mapping_system import MappingSystem
+from .placement_system import PlacementSystem
 from .physics_system import PhysicsSystem
 from .racing_system import RacingSystem
 from .audio_system import AudioSystem
@@ -52,6 +56,10 @@ def load_image(asset_name, center=True, anchor_x=0, anchor_y=0):
     return image
 
 
+def load_sound(asset_name):
+    return pyglet.media.load(os.path.join("assets", asset_name), streaming=False)
+
+
 class GameWindow(pyglet.window.Window):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -60,74 +68,101 @@ class GameWindow(pyglet.window.Window):
         self.create_fps_meter()
 
     def load_assets(self):
+        # Each asset is loaded the first time it is looked up
         # Ship Images
-        ASSETS["Avocado"] = load_image("ship-base-256x256.png")
-        ASSETS["Martian Express"] = load_image("ship-speed-256x256.png")
-        ASSETS["Sparrow"] = load_image("ship-speed-weapon-256x256.png")
-        ASSETS["BMS-12"] = load_image("ship-weapon-256x256.png")
-
-        ASSETS["asteroid_large"] = load_image("large-asteroid-512x512.png")
-        ASSETS["asteroid_medium"] = load_image("medium-asteroid-256x256.png")
-        ASSETS["asteroid_small"] = load_image("asteroid-small-128x128.png")
-        ASSETS["base_flare"] = load_image("base-flare-32x32.png")
-        ASSETS["black_hole"] = load_image("black-hole-1024x1024.png")
-        ASSETS["boost_powerup"] = load_image("boost-powerup-256x256.png")
-        ASSETS["boost_tick_blue"] = load_image("boost-tick-blue-48x48.png")
-        ASSETS["boost_tick_red"] = load_image("boost-tick-red-48x48.png")
-        ASSETS["boost_tick_yellow"] = load_image("boost-tick-yellow-48x48.png")
-        ASSETS["boost_ui_base"] = load_image("boost-ui-base-288x64.png")
-        ASSETS["checkpoint_arrow"] = load_image(
-            "checkpoint-arrow-128x128.png", anchor_x=128, anchor_y=64
+        ASSETS.register("Avocado", load_image, "ship-base-256x256.png")
+        ASSETS.register("Martian Express", load_image, "ship-speed-256x256.png")
+        ASSETS.register("Sparrow", load_image, "ship-speed-weapon-256x256.png")
+        ASSETS.register("BMS-12", load_image, "ship-weapon-256x256.png")
+
+        ASSETS.register("asteroid_large", load_image, "large-asteroid-512x512.png")
+        ASSETS.register("asteroid_medium", load_image, "medium-asteroid-256x256.png")
+        ASSETS.register("asteroid_small", load_image, "asteroid-small-128x128.png")
+        ASSETS.register("base_flare", load_image, "base-flare-32x32.png")
+        ASSETS.register("black_hole", load_image, "black-hole-1024x1024.png")
+        ASSETS.register("boost_powerup", load_image, "boost-powerup-256x256.png")
+        ASSETS.register("boost_tick_blue", load_image, "boost-tick-blue-48x48.png")
+        ASSETS.register("boost_tick_red", load_image, "boost-tick-red-48x48.png")
+        ASSETS.register("boost_tick_yellow", load_image, "boost-tick-yellow-48x48.png")
+        ASSETS.register("boost_ui_base", load_image, "boost-ui-base-288x64.png")
+        ASSETS.register(
+            "checkpoint_arrow",
+            load_image,
+            "checkpoint-arrow-128x128.png",
+            anchor_x=128,
+            anchor_y=64,
+        )
+        ASSETS.register(
+            "checkpoint_bottom", load_image, "checkpoint-bottom-256x256.png"
+        )
+        ASSETS.register(
+            "checkpoint_finish_bottom",
+            load_image,
+            "checkpoint-finish-bottom-256x256.png",
+        )
+        ASSETS.register(
+            "checkpoint_finish_top", load_image, "checkpoint-finish-top-256x256.png"
+        )
+        ASSETS.register(
+            "checkpoint_next_bottom", load_image, "checkpoint-next-bottom-256x256.png"
+        )
+        ASSETS.register(
+            "checkpoint_next_top", load_image, "checkpoint-next-top-256x256.png"
         )
-        ASSETS["checkpoint_bottom"] = load_image("checkpoint-bottom-256x256.png")
-        ASSETS["checkpoint_finish_bottom"] = load_image(
-            "checkpoint-finish-bottom-256x256.png"
+        ASSETS.register(
+            "checkpoint_passed_bottom",
+            load_image,
+            "checkpoint-passed-bottom-256x256.png",
         )
-        ASSETS["checkpoint_finish_top"] = load_image(
-            "checkpoint-finish-top-256x256.png"
+        ASSETS.register(
+            "checkpoint_passed_top", load_image, "checkpoint-passed-top-256x256.png"
         )
-        ASSETS["checkpoint_next_bottom"] = load_image(
-            "checkpoint-next-bottom-256x256.png"
+        ASSETS.register("checkpoint_top", load_image, "checkpoint-top-256x256.png")
+        ASSETS.register(
+            "closer_stars", load_image, "closer-stars-2048x2048.png", center=False
         )
-        ASSETS["checkpoint_next_top"] = load_image("checkpoint-next-top-256x256.png")
-        ASSETS["checkpoint_passed_bottom"] = load_image(
-            "checkpoint-passed-bottom-256x256.png"
+        ASSETS.register("dwarf_gas_planet", load_image, "dwarf-gas-planet-512x512.png")
+        ASSETS.register("earth", load_image, "earth-1024x1024.png")
+        ASSETS.register(
+            "energy_particle_cyan", load_image, "energy-particle-cyan-64x64.png"
         )
-        ASSETS["checkpoint_passed_top"] = load_image(
-            "checkpoint-passed-top-256x256.png"
+        ASSETS.register(
+            "energy_particle_red", load_image, "energy-particle-red-64x64.png"
         )
-        ASSETS["checkpoint_top"] = load_image("checkpoint-top-256x256.png")
-        ASSETS["closer_stars"] = load_image("closer-stars-2048x2048.png", center=False)
-        ASSETS["dwarf_gas_planet"] = load_image("dwarf-gas-planet-512x512.png")
-        ASSETS["earth"] = load_image("earth-1024x1024.png")
-        ASSETS["energy_particle_cyan"] = load_image("energy-particle-cyan-64x64.png")
-        ASSETS["energy_particle_red"] = load_image("energy-particle-red-64x64.png")
-        ASSETS["gas_giant"] = load_image("gas-giant-1024x1024.png")
-        ASSETS["medium_gas_planet"] = load_image("medium-gas-planet-512x512.png")
-        ASSETS["moon"] = load_image("moon-128x128.png")
-        ASSETS["nebula"] = load_image("nebula-2048x2048.png", center=False)
-        ASSETS["particle_flare"] = load_image("particle-flare-32x32.png")
-        ASSETS["red_planet"] = load_image("red-planet-512x512.png")
-        ASSETS["red_planet_shield"] = load_image("red-planet-shield-512x512.png")
-        ASSETS["satellite"] = load_image("satellite-256x256.png")
-        ASSETS["slowdown"] = load_image("slowdown-256x256.png")
-        ASSETS["star_field"] = load_image("starfield-2048x2048.png", center=False)
-        ASSETS["3_2_1"] = pyglet.media.load(os.path.join("assets", "3_2_1.wav"), streaming=False)
-        ASSETS["go"] = pyglet.media.load(os.path.join("assets", "go.wav"), streaming=False)
-        ASSETS["collision"] = pyglet.media.load(os.path.join("assets", "collision.wav"), streaming=False)
-        ASSETS["map_win"] = pyglet.media.load(os.path.join("assets", "fanfare_low.wav"), streaming=False)
-        ASSETS["cp_complete"] = pyglet.media.load(os.path.join("assets", "cp_complete.wav"), streaming=False)
-        ASSETS["slowdown_sound"] = pyglet.media.load(os.path.join("assets", "slowdown.wav"), streaming=False)
-        ASSETS["boost_powerup_sound"] = pyglet.media.load(os.path.join("assets", "boost_powerup.wav"), streaming=False)
-        ASSETS["thrust_sound"] = pyglet.media.load(os.path.join("assets", "regular_thrust.wav"), streaming=False)
-        ASSETS["boost_sound"] = pyglet.media.load(os.path.join("assets", "booster_thrust_16.wav"), streaming=False)
-        ASSETS["large_red_planet"] = load_image("red-planet-4096x4096.png")
-        ASSETS["tutorial_map"] = load_image("map-tutorial_map-256x256.png")
-        ASSETS["getting_started"] = load_image("map-getting_started-256x256.png")
-        ASSETS["random_map"] = load_image("map-random_map-256x256.png")
-        ASSETS["slalom_map"] = load_image("map-slalom_map-256x256.png")
-        ASSETS["speedy_map"] = load_image("map-speedy_map-256x256.png")
-        ASSETS["final_map"] = load_image("map-final_map-256x256.png")
+        ASSETS.register("gas_giant", load_image, "gas-giant-1024x1024.png")
+        ASSETS.register(
+            "medium_gas_planet", load_image, "medium-gas-planet-512x512.png"
+        )
+        ASSETS.register("moon", load_image, "moon-128x128.png")
+        ASSETS.register("nebula", load_image, "nebula-2048x2048.png", center=False)
+        ASSETS.register("particle_flare", load_image, "particle-flare-32x32.png")
+        ASSETS.register("red_planet", load_image, "red-planet-512x512.png")
+        ASSETS.register(
+            "red_planet_shield", load_image, "red-planet-shield-512x512.png"
+        )
+        ASSETS.register("satellite", load_image, "satellite-256x256.png")
+        ASSETS.register("slowdown", load_image, "slowdown-256x256.png")
+        ASSETS.register(
+            "star_field", load_image, "starfield-2048x2048.png", center=False
+        )
+        ASSETS.register("3_2_1", load_sound, "3_2_1.wav")
+        ASSETS.register("go", load_sound, "go.wav")
+        ASSETS.register("collision", load_sound, "collision.wav")
+        ASSETS.register("map_win", load_sound, "fanfare_low.wav")
+        ASSETS.register("cp_complete", load_sound, "cp_complete.wav")
+        ASSETS.register("slowdown_sound", load_sound, "slowdown.wav")
+        ASSETS.register("boost_powerup_sound", load_sound, "boost_powerup.wav")
+        ASSETS.register("thrust_sound", load_sound, "regular_thrust.wav")
+        ASSETS.register("boost_sound", load_sound, "booster_thrust_16.wav")
+        ASSETS.register("large_red_planet", load_image, "red-planet-4096x4096.png")
+        ASSETS.register("tutorial_map", load_image, "map-tutorial_map-256x256.png")
+        ASSETS.register(
+            "getting_started", load_image, "map-getting_started-256x256.png"
+        )
+        ASSETS.register("random_map", load_image, "map-random_map-256x256.png")
+        ASSETS.register("slalom_map", load_image, "map-slalom_map-256x256.png")
+        ASSETS.register("speedy_map", load_image, "map-speedy_map-256x256.png")
+        ASSETS.register("final_map", load_image, "map-final_map-256x256.png")
         Entity().attach(InputComponent())
 
     def create_fps_meter(self):
@@ -138,8 +173,8 @@ class GameWindow(pyglet.window.Window):
             def inner():
                 nonlocal ticks
                 nonlocal tick
-                if ecs.DELTA_TIME > 0:
-                    FPS = 1.0 / ecs.DELTA_TIME
+                if Entity.world.delta_time > 0:
+                    FPS = 1.0 / Entity.world.delta_time
                 else:
                     FPS = 60
                 ticks[tick] = int(FPS)
@@ -176,7 +211,7 @@ class GameWindow(pyglet.window.Window):
     def create_ship(self):
         # Entity Components
         entity = Entity()
-        physics = PhysicsComponent(position=V2(0, 0), rotation=0, static=False)
+        physics = PhysicsComponent(position=V2(0, 0), rotation=0)
         ship = ShipComponent()
 
         # Game Visuals
@@ -218,8 +253,10 @@ class GameWindow(pyglet.window.Window):
         ]
 
         entity.attach(physics)
+        entity.attach(DynamicComponent())
         entity.attach(ship)
         entity.attach(CollisionComponent(circle_radius=24))
+        entity.attach(TrajectoryComponent())
         entity.attach(GameVisualComponent(visuals=game_visuals))
         entity.attach(UIVisualComponent(visuals=ui_visuals))
 
@@ -291,11 +328,12 @@ class GameWindow(pyglet.window.Window):
             window.camera_zoom *= 1.1
 
 
-def run_game():
+def create_game(visible=True):
+    "Builds the window and every system, ready for System.advance"
 
     # Create a Window entity
     window_entity = Entity()
-    window = GameWindow(1280, 720, resizable=True)
+    window = GameWindow(1280, 720, resizable=True, visible=visible)
     window_entity.attach(
         WindowComponent(
             window=window,
@@ -313,6 +351,10 @@ def run_game():
     # Make, load, and manage maps
     CartographySystem()
 
+    # Map editing tools, only built once a session starts using them
+    MappingSystem.build_on("StartMapping")
+    PlacementSystem.build_on("StartPlacements")
+
     # Physics system handles movement an collision
     PhysicsSystem()
 
@@ -326,11 +368,19 @@ def run_game():
     RenderSystem()
 
     System.dispatch(event="DisplayMenu", menu_name="main menu")
+    return window
+
+
+def run_game(deterministic=False):
+    """Opens the game window and runs until it closes. A deterministic game
+    takes one fixed step per frame, see World.make_deterministic."""
+    if deterministic:
+        Entity.world.make_deterministic()
+    window = create_game()
 
     def update(dt, *args, **kwargs):
-        ecs.DELTA_TIME = dt
         window.clear()
-        System.update_all()
+        System.advance(dt)
 
     pyglet.clock.schedule(update, 1 / 60.0)
     pyglet.app.run()
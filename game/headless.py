@@ -0,0 +1,129 @@
+from .assets import ASSETS
+from .cartography_system import CartographySystem
+from .common import create_world, get_active_map_entity, set_ship_stats
+from .components import (
+    CollisionComponent,
+    DynamicComponent,
+    GameVisualComponent,
+    InputComponent,
+    PhysicsComponent,
+    ShipComponent,
+    TrajectoryComponent,
+    WindowComponent,
+)
+from .ecs import FIXED_DELTA_TIME, Entity
+from .physics_system import PhysicsSystem
+from .pool import POOL, StandIn
+from .racing_system import RacingSystem
+from .settings import settings as game_settings
+from .vector import V2
+
+# Keys of InputComponent a script can hold down
+INPUT_KEYS = ("w", "a", "s", "d", "boost")
+
+
+class HeadlessWindow:
+    "Stands in for the game window, the simulation only asks for its size"
+
+    width = 1280
+    height = 720
+
+
+def go_headless():
+    """Stops the pool and assets from touching GL, for the whole process:
+    sprites, labels and images all become StandIns"""
+    POOL.headless = True
+    ASSETS.stand_in = StandIn()
+
+
+class Simulation:
+    """Cartography, physics and racing on a map, with no window, GL or audio
+
+    Runs in deterministic mode, one fixed step per step() however fast the
+    CPU goes. Inputs are held until changed, aim turns the ship to face a
+    direction in degrees like the mouse does.
+
+    Settings are the DEFAULTS with any overrides given, kept in memory for
+    the rest of the process, so runs are the same on any machine and
+    settings.json is neither read nor written.
+
+    sim = Simulation("speedy_map", settings={"selected_ship": "BMS-12"})
+    sim.step(w=True, aim=45.0)
+    result = sim.run(5000, script={0: {"w": True}, 600: {"boost": True}})
+    """
+
+    def __init__(self, map_name, mode="racing", save_records=False, settings=None):
+        go_headless()
+        game_settings.in_memory(**(settings or {}))
+        self.world = create_world()
+        self.world.make_deterministic()
+        with self.world.activated():
+            Entity().attach(
+                WindowComponent(window=HeadlessWindow(), background_layers=[])
+            )
+            Entity().attach(InputComponent())
+            self.ship = self.create_ship()
+            CartographySystem()
+            PhysicsSystem()
+            racing = RacingSystem()
+            racing.save_records = save_records
+        self.steps = 0
+
+        game_settings.physics_frozen = False
+        self.world.dispatch("LoadMap", map_name=map_name, mode=mode)
+        self.world.drain_events()
+
+    def create_ship(self):
+        entity = Entity()
+        physics = PhysicsComponent(position=V2(0, 0), rotation=0)
+        ship = ShipComponent()
+        set_ship_stats(game_settings.selected_ship, ship, physics)
+        entity.attach(physics)
+        entity.attach(DynamicComponent())
+        entity.attach(ship)
+        entity.attach(CollisionComponent(circle_radius=24))
+        entity.attach(TrajectoryComponent())
+        entity.attach(GameVisualComponent(visuals=[]))
+        return entity
+
+    @property
+    def map(self):
+        with self.world.activated():
+            map_entity = get_active_map_entity()
+        return None if map_entity is None else map_entity["map"]
+
+    @property
+    def finish_time(self):
+        "Seconds the race took, None until it is finished"
+        map_ = self.map
+        if map_ is None or map_.race_end_time is None:
+            return None
+        return map_.race_end_time - map_.race_start_time
+
+    def step(self, aim=None, **keys):
+        "Sets any keys given, e.g. w=True, then runs one fixed step"
+        inputs = self.world.singleton("input")["input"]
+        for name, value in keys.items():
+            if name not in INPUT_KEYS:
+                raise ValueError(f"Unknown input {name!r}")
+            setattr(inputs, name, value)
+        if aim is not None:
+            self.ship["physics"].rotation = aim
+        self.world.advance(FIXED_DELTA_TIME)
+        self.steps += 1
+
+    def run(self, steps, script=None, until_finished=True):
+        """Runs up to steps steps, applying script's inputs on the step they
+        are keyed by. Returns where the ship ended up and the finish time."""
+        script = script or {}
+        for _ in range(steps):
+            self.step(**script.get(self.steps, {}))
+            if until_finished and self.finish_time is not None:
+                break
+        physics = self.ship["physics"]
+        return {
+            "steps": self.steps,
+            "finish_time": self.finish_time,
+            "position": tuple(physics.position),
+            "velocity": tuple(physics.velocity),
+        }
@@ -0,0 +1,58 @@
+import os
+import json
+
+from .common import *
+from .ecs import *
+from .vector import V2
+
+
+class MappingSystem(System):
+    """Records the ship's flight path while the active map is in mapping
+    mode. Built the first time mapping starts."""
+
+    reads = ("map", "ship", "physics")
+    writes = ("map",)
+    fixed_step = True
+
+    def setup(self):
+        self.subscribe("StartMapping", self.handle_start_mapping)
+        self.subscribe("StopMapping", self.handle_stop_mapping)
+
+    def handle_start_mapping(self, **kwargs):
+        map_entity = get_active_map_entity()
+        map_ = map_entity["map"]
+        map_.flight_path = []
+        map_.mode = "mapping"
+
+    def handle_stop_mapping(self, **kwargs):
+        map_entity = get_active_map_entity()
+        map_ = map_entity["map"]
+        with open(os.path.join("maps", f"{map_.map_name}_path.json"), "w") as f:
+            f.write(json.dumps(map_.flight_path, indent=2))
+        map_.flight_path = []
+        map_.mode = "freeplay"
+
+    def update(self):
+        map_entity = get_active_map_entity()
+        if not map_entity:
+            return
+
+        map_ = map_entity["map"]
+
+        if not map_.mode == "mapping":
+            return
+
+        entity = get_ship_entity()
+        position = entity["physics"].position
+
+        if len(map_.flight_path) == 0:
+            map_.flight_path.append({"x": position.x, "y": position.y})
+
+        # Calculate distance to from the last mapped point to see
+        # if we have traveled far enough to warrant mapping another point
+        last_point = map_.flight_path[-1]
+        last_point = V2(last_point["x"], last_point["y"])
+        distance = (last_point - position).length
+
+        if distance > 50:
+            map_.flight_path.append({"x": position.x, "y": position.y})
@@ -72,18 +72,33 @@ MAPS = {
 
 
 class MenuSystem(System):
+    reads = ()
+    writes = ()
+
     def setup(self):
         self.subscribe("DisplayMenu", self.handle_display_menu)
         self.subscribe("MenuSelection", self.handle_menu_selection)
         self.subscribe("MenuAccept", self.handle_menu_accept)
         self.subscribe("Pause", self.handle_pause)
         self.subscribe("RaceComplete", self.handle_race_complete)
-        self.create_main_menu()
-        self.create_ship_menu()
-        self.create_settings_menu()
-        self.create_map_menu()
-        self.create_in_game_menu()
-        self.create_finish_menu()
+        self.menus = self.world.query("menu", "ui visual")
+        # Menu name -> function creating it, each menu is only created
+        # the first time it is displayed
+        self.menu_builders = {
+            "main menu": self.create_main_menu,
+            "ship menu": self.create_ship_menu,
+            "settings menu": self.create_settings_menu,
+            "map menu": self.create_map_menu,
+            "in-game menu": self.create_in_game_menu,
+            "finish menu": self.create_finish_menu,
+        }
+        self.built_menus = set()
+
+    def build_menu(self, menu_name):
+        if menu_name in self.built_menus:
+            return
+        self.built_menus.add(menu_name)
+        self.menu_builders[menu_name]()
 
 
     def handle_pause(self):
@@ -96,7 +111,7 @@ class MenuSystem(System):
             System.dispatch(event="DisplayMenu", menu_name="in-game menu")
 
     def handle_menu_selection(self, *, direction, **kwargs):
-        for entity in Entity.with_component("menu"):
+        for entity in self.menus:
             menu = entity["menu"]
             if not menu.displayed:
                 continue
@@ -135,7 +150,7 @@ class MenuSystem(System):
 
 
     def handle_menu_accept(self, **kwargs):
-        for entity in Entity.with_component("menu"):
+        for entity in self.menus:
             menu = entity["menu"]
             if not menu.displayed:
                 continue
@@ -148,7 +163,7 @@ class MenuSystem(System):
         # Unlock physics
         settings.physics_frozen = False
 
-        for menu_entity in Entity.with_component("menu"):
+        for menu_entity in self.menus:
             menu = menu_entity["menu"]
             menu.displayed = False
 
@@ -184,7 +199,8 @@ class MenuSystem(System):
             return
         settings.physics_frozen = True
 
-        for menu_entity in Entity.with_component("menu"):
+        self.build_menu("finish menu")
+        for menu_entity in self.menus:
             menu = menu_entity["menu"]
             if menu.menu_name == 'finish menu':
                 menu.displayed = True
@@ -210,7 +226,7 @@ class MenuSystem(System):
 
     def change_audio_setting(self):
         settings.audio = not settings.audio
-        for menu_entity in Entity.with_component("menu"):
+        for menu_entity in self.menus:
             menu = menu_entity["menu"]
             if menu.menu_name == "settings menu":
                 option_index = menu.selected_option
@@ -219,7 +235,7 @@ class MenuSystem(System):
 
     def change_turning_style(self):
         settings.mouse_turning = not settings.mouse_turning
-        for menu_entity in Entity.with_component("menu"):
+        for menu_entity in self.menus:
             menu = menu_entity["menu"]
             if menu.menu_name == "settings menu":
                 option_index = menu.selected_option
@@ -228,7 +244,7 @@ class MenuSystem(System):
 
     def change_camera_spring(self):
         settings.camera_spring = not settings.camera_spring
-        for menu_entity in Entity.with_component("menu"):
+        for menu_entity in self.menus:
             menu = menu_entity["menu"]
             if menu.menu_name == "settings menu":
                 option_index = menu.selected_option
@@ -238,18 +254,17 @@ class MenuSystem(System):
     def restart(self):
         settings.physics_frozen = False
 
-        for menu_entity in Entity.with_component("menu"):
+        for menu_entity in self.menus:
             menu = menu_entity["menu"]
             menu.displayed = False
 
         map_entity = get_active_map_entity()
         if map_entity:
-            map_ = map_entity['map']
-            System.dispatch(event="LoadMap", map_name=map_.map_name, mode=map_.mode)
+            System.dispatch(event="RestartMap", map_entity_id=map_entity.entity_id)
 
     def back_to_race(self):
         settings.physics_frozen = False
-        for menu_entity in Entity.with_component("menu"):
+        for menu_entity in self.menus:
             menu = menu_entity["menu"]
             menu.displayed = False
 
@@ -552,17 +567,17 @@ class MenuSystem(System):
             ship_entity = get_ship_entity()
             ship_physics = ship_entity["physics"]
             ship_physics.position = V2(-10000, -10000)
+            ship_physics.previous_position = None
 
             # Move window camera to origin
             window = get_window()
             window.camera_position = V2(0, 0)
+            window.previous_camera_position = None
 
-        for menu_entity in Entity.with_component("menu"):
+        self.build_menu(menu_name)
+        for menu_entity in self.menus:
             menu = menu_entity["menu"]
             if menu.menu_name == menu_name:
                 menu.displayed = True
             else:
                 menu.displayed = False
-
-    def update(self):
-        pass
@@ -0,0 +1,165 @@
+from math import cos, radians, sin
+
+import numpy as np
+import pyglet
+
+from .pool import GL_ONE_MINUS_SRC_ALPHA, GL_SRC_ALPHA
+
+# Most particles an emitter shows at once, a new one takes the oldest slot
+PARTICLE_CAPACITY = 128
+# Particles fading below this opacity are gone
+MIN_OPACITY = 0.01
+# Where free slots' quads are parked, far outside any map so they're
+# clipped away before rasterizing
+PARKED = -1e7
+
+
+class Textures:
+    """Packs particle images into shared textures, so every emitter's quads
+    can be drawn with one texture bound, and together when they share a
+    batch and blend mode
+
+    region = TEXTURES.region(ASSETS["energy_particle_red"])
+    """
+
+    def __init__(self):
+        self.atlases = None
+        # Image -> its region of a shared texture
+        self.regions = {}
+
+    def region(self, image):
+        region = self.regions.get(image)
+        if region is None:
+            if self.atlases is None:
+                self.atlases = pyglet.image.atlas.TextureBin(512, 512)
+            # The image's anchor is left behind, blitting would offset by it
+            data = image.get_image_data().get_region(0, 0, image.width, image.height)
+            region = self.regions[image] = self.atlases.add(data)
+        return region
+
+
+TEXTURES = Textures()
+
+
+class Particles:
+    """Fading particles in fixed capacity NumPy arrays, used as a ring
+    buffer so emitting never allocates
+
+    Every particle is a quad in one vertex list preallocated in the batch,
+    with the images packed into a shared texture, so drawing the batch
+    draws them all at once. Fading is one pass over the arrays. Without a batch,
+    e.g. headless, only the arrays are kept.
+
+    particles = Particles([cyan, red], batch, blend_dest=GL_ONE)
+    particles.emit(x, y, rotation, image=1)
+    particles.fade(0.9)
+    """
+
+    def __init__(
+        self,
+        images,
+        batch=None,
+        capacity=PARTICLE_CAPACITY,
+        blend_src=GL_SRC_ALPHA,
+        blend_dest=GL_ONE_MINUS_SRC_ALPHA,
+    ):
+        self.capacity = capacity
+        self.position = np.zeros((capacity, 2))
+        # Degrees anticlockwise, like PhysicsComponent.rotation
+        self.rotation = np.zeros(capacity)
+        # 0 to 255, 0 for free slots
+        self.opacity = np.zeros(capacity)
+        # Index into images
+        self.image = np.zeros(capacity, dtype=int)
+        # Slot the next particle is emitted into
+        self.next = 0
+        self.vertex_list = None
+        if batch is not None:
+            self.allocate(images, batch, blend_src, blend_dest)
+
+    def __len__(self):
+        return int(np.count_nonzero(self.opacity))
+
+    def allocate(self, images, batch, blend_src, blend_dest):
+        "Packs the images into a shared texture and adds every slot's quad to batch"
+        regions = [TEXTURES.region(image) for image in images]
+        texture = regions[0].owner
+        assert all(region.owner is texture for region in regions)
+        # Quad corners around the particle and texture coordinates, by image
+        corners = []
+        for image in images:
+            x1, y1 = -image.anchor_x, -image.anchor_y
+            x2, y2 = x1 + image.width, y1 + image.height
+            corners.append([(x1, y1), (x2, y1), (x2, y2), (x1, y2)])
+        self.corners = np.array(corners, dtype=float)
+        self.tex_coords = np.array([region.tex_coords for region in regions])
+
+        group = pyglet.sprite.SpriteGroup(texture, blend_src, blend_dest)
+        self.vertex_list = batch.add(
+            self.capacity * 4,
+            pyglet.gl.GL_QUADS,
+            group,
+            "v2f/stream",
+            "c4B/stream",
+            "t3f/dynamic",
+        )
+        # Free slots are white, see through and parked, the buffer starts
+        # out holding whatever was there before
+        self.array("vertices")[:] = PARKED
+        self.array("tex_coords")[:] = 0.0
+        self.array("colors")[:] = 255
+        self.array("colors")[:, :, 3] = 0
+
+    def array(self, name):
+        """One of the vertex list's attributes as a NumPy view, shaped
+        (slot, corner, value). Writing to it updates the vertex list."""
+        return np.ctypeslib.as_array(getattr(self.vertex_list, name)).reshape(
+            self.capacity, 4, -1
+        )
+
+    def emit(self, x, y, rotation, image=0):
+        slot = self.next
+        self.next = (slot + 1) % self.capacity
+        self.position[slot] = x, y
+        self.rotation[slot] = rotation
+        self.opacity[slot] = 255.0
+        self.image[slot] = image
+        if self.vertex_list is None:
+            return
+
+        # Rotated anticlockwise about the particle, as a sprite turned by
+        # -rotation is
+        angle = radians(rotation)
+        c = cos(angle)
+        s = sin(angle)
+        quad = self.corners[image] @ np.array([[c, s], [-s, c]]) + (x, y)
+        self.array("vertices")[slot] = quad
+        self.array("tex_coords")[slot] = self.tex_coords[image].reshape(4, 3)
+        self.array("colors")[slot, :, 3] = 255
+
+    def fade(self, factor):
+        "Scales every particle's opacity, freeing the slots of those gone"
+        opacity = self.opacity
+        alive = opacity > 0
+        if not alive.any():
+            return
+        opacity *= factor
+        gone = alive & (opacity < MIN_OPACITY)
+        opacity[gone] = 0.0
+        if self.vertex_list is None:
+            return
+
+        self.array("colors")[:, :, 3] = opacity.astype(np.uint8)[:, np.newaxis]
+        if gone.any():
+            self.array("vertices")[gone] = PARKED
+
+    def clear(self):
+        self.opacity[:] = 0.0
+        if self.vertex_list is not None:
+            self.array("vertices")[:] = PARKED
+            self.array("colors")[:, :, 3] = 0
+
+    def delete(self):
+        if self.vertex_list is not None:
+            self.vertex_list.delete()
+            self.vertex_list = None
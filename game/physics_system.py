@@ -1,18 +1,88 @@
-from random import random
 
+import numpy as np
 import pyglet
 
 from . import ecs
 from .settings import settings
 from .common import *
 from .ecs import *
+from .bodies import Bodies
+from . import gravity as gravity_module
+from .gravity import GRID_MARGIN, GravityGrid
+from .particles import Particles
+from .pool import GL_ONE
+from .spatial import FLARE_DISTANCE, SpatialHash, time_of_impact
+from .trajectory import STEPS_PER_UPDATE, Predictor, diverged
 from .vector import V2
 
 
+# Bounces resolved per step, enough for a ship wedged between colliders
+MAX_IMPACTS_PER_STEP = 4
+
+
+def engine_thrust(inputs, rotation, physics, ship, boosting):
+    "Acceleration the ship's engines give for the inputs held, before gravity"
+    acceleration = V2(0.0, 0.0)
+
+    # Without mouse turning, a and d turn the ship rather than strafe
+    if inputs.a and settings.MOUSE_TURNING:
+        acceleration += V2.from_degrees_and_length(rotation + 180, 0.4)
+
+    if inputs.d and settings.MOUSE_TURNING:
+        acceleration += V2.from_degrees_and_length(rotation, 0.4)
+
+    if inputs.w or inputs.boost:
+        acceleration += V2.from_degrees_and_length(rotation + 90, 1.0)
+
+    if inputs.s:
+        acceleration += V2.from_degrees_and_length(rotation + 270, 0.4)
+
+    acc_constant = physics.acc_constant if settings.ACCELERATION else 0.0
+    acceleration *= acc_constant
+
+    if boosting:
+        acceleration *= ship.boost_constant if settings.BOOST else 0.0
+    return acceleration
+
+
 class PhysicsSystem(System):
+    reads = (
+        "input",
+        "ship",
+        "physics",
+        "collision",
+        "flight path",
+        "window",
+        "trajectory",
+    )
+    writes = ("ship", "physics", "game visual", "flight path", "window", "trajectory")
+    fixed_step = True
+
     def setup(self):
         self.subscribe("CenterCamera", self.handle_center_camera)
         self.subscribe("Respawn", self.handle_respawn)
+        self.subscribe("MapLoaded", self.handle_map_loaded)
+        self.subscribe("ExitMap", self.handle_exit_map)
+        self.checkpoints = self.world.query("physics", "checkpoint")
+        self.colliders = self.world.query("physics", "collision")
+        # Broad phase, so the ship is only tested against colliders near it
+        self.collision_hash = SpatialHash()
+        self.world.on_remove("collision", self.forget_collider)
+        # Flight path flares by where they are, and the ones lit up now
+        self.flare_hash = SpatialHash(FLARE_DISTANCE)
+        self.lit_flares = set()
+        # Flight path entity -> the flares of it in the hash
+        self.indexed_flares = {}
+        # Whether flares were indexed since they were last lit up
+        self.flares_reindexed = False
+        self.world.on_remove("flight path", self.forget_flares)
+        self.bodies = self.world.query("physics", "dynamic")
+        # Struct-of-arrays copy of the bodies for batched integration
+        self.store = Bodies(self.world)
+        # Baked pull of the active map's static masses
+        self.grid = None
+        # Steps the ship's forecast, remade whenever what it assumed changes
+        self.predictor = None
 
     def handle_center_camera(self, **kwargs):
         if settings.PHYSICS_FROZEN:
@@ -21,15 +91,45 @@ class PhysicsSystem(System):
         ship_entity = get_ship_entity()
         ship_physics = ship_entity["physics"]
         window.camera_position = ship_physics.position
+        window.previous_camera_position = None
+
+    def handle_map_loaded(self, *, map_name, **kwargs):
+        # The map set the masses after attaching them, find them again now
+        self.store.forget_static_masses()
+        self.store.static_masses()
+        self.grid = None
+        # Read at load, so the grid can be switched on without reimporting
+        if not gravity_module.GRAVITY_GRID:
+            return
+        # Planets, moons and black holes never move once the map places them
+        positions, masses = self.store.static_masses()
+        if not len(masses):
+            return
+        # The grid covers the masses and the flight path, with room to spare
+        extent = [positions]
+        for fp in self.world.components("flight path"):
+            extent.append(np.array([(point.x, point.y) for point in fp.path]))
+        extent = np.concatenate(extent)
+        bounds = (extent.min(axis=0) - GRID_MARGIN, extent.max(axis=0) + GRID_MARGIN)
+        self.grid = GravityGrid.for_map(
+            map_name,
+            positions,
+            masses,
+            bounds,
+            settings.GRAV_CONSTANT,
+            settings.MAX_GRAV_ACC,
+        )
+
+    def handle_exit_map(self, **kwargs):
+        self.grid = None
 
     def handle_respawn(self, **kwargs):
         if settings.PHYSICS_FROZEN:
             return
         ship_entity = get_ship_entity()
         ship_physics = ship_entity["physics"]
-        checkpoints = Entity.with_component("checkpoint")
         completed_checkpoint = None
-        for entity in sorted(checkpoints, key=lambda e: e['checkpoint'].cp_order):
+        for entity in sorted(self.checkpoints, key=lambda e: e['checkpoint'].cp_order):
             checkpoint = entity["checkpoint"]
             if checkpoint.completed:
                 completed_checkpoint = entity
@@ -37,12 +137,19 @@ class PhysicsSystem(System):
             checkpoint_physics = completed_checkpoint["physics"]
             ship_physics.position = checkpoint_physics.position
             ship_physics.rotation = checkpoint_physics.rotation
+            ship_physics.previous_position = None
             ship_physics.velocity = V2.from_degrees_and_length(
                 checkpoint_physics.rotation + 90, 6.0
             )
 
     def update(self):
+        # Runs while frozen too, so no collider moves and no map loads unseen
+        self.update_collision_hash()
+        self.update_flare_index()
+        self.store_previous_state()
         if settings.PHYSICS_FROZEN:
+            # Nothing moves, e.g. in the menus, so there's nothing to forecast
+            self.clear_trajectory()
             return
         self.update_ship_controls()
         self.update_all_physics_objects()
@@ -50,109 +157,129 @@ class PhysicsSystem(System):
         self.update_ship_collision()
         self.update_camera_position()
         self.update_flares()
+        self.update_trajectory()
+
+    def update_collision_hash(self):
+        # Colliders attached or moved since the last step, whatever moved
+        # them. Static ones are only ever inserted once, at map load.
+        since = self.last_run
+        moved = set(self.colliders.changed("collision", since))
+        moved.update(self.colliders.changed("physics", since))
+        for entity in moved:
+            self.collision_hash.insert(
+                entity, entity["physics"].position, entity["collision"].circle_radius
+            )
+
+    def forget_collider(self, entity, collision):
+        self.collision_hash.remove(entity)
+
+    def store_previous_state(self):
+        # The render system interpolates between these and the state
+        # at the end of this step
+        for (physics,) in self.bodies.columns("physics"):
+            # Bodies at rest are left alone so they don't count as changed
+            if physics.previous_position is not physics.position:
+                physics.previous_position = physics.position
+            if physics.previous_rotation != physics.rotation:
+                physics.previous_rotation = physics.rotation
+        window = self.world.frame.window["window"]
+        window.previous_camera_position = window.camera_position
 
     def update_flares(self):
-        dt = ecs.DELTA_TIME
-        time_factor = dt / 0.01667
-        ship_entity = get_ship_entity()
+        ship_entity = self.world.frame.ship
+        # Opacity only depends on where the ship is relative to the flares
+        ship_moved = self.world.has_changed(ship_entity, "physics", self.last_run)
+        if not ship_moved and not self.flares_reindexed:
+            return
+        self.flares_reindexed = False
         ship_position = ship_entity["physics"].position
 
-        for entity in Entity.with_component("flight path"):
-            fp = entity['flight path']
-            for s in fp.flares:
-                flare_pos = V2(s.x, s.y)
-                distance = (ship_position - flare_pos).length
-                if distance < 750:
+        lit = set()
+        for s in self.flare_hash.nearby(ship_position, FLARE_DISTANCE):
+            distance = (ship_position - V2(s.x, s.y)).length
+            if distance < FLARE_DISTANCE:
+                opacity = int(255 * (1 - (distance / FLARE_DISTANCE)))
+                if not s.visible:
                     s.visible = True
-                    s.opacity = int(255 * (1 - (distance / 750)))
-                else:
-                    s.visible = False
-
-
-    def get_all_masses(self):
-        mass_points = []
-        for entity in Entity.with_component("physics"):
-            physics = entity["physics"]
-            if physics.mass != 0.0:
-                mass_points.append((physics.position, physics.mass))
-        return mass_points
+                if s.opacity != opacity:
+                    s.opacity = opacity
+                lit.add(s)
+        # Flares the ship moved away from are turned off once
+        for s in self.lit_flares - lit:
+            s.visible = False
+        self.lit_flares = lit
+
+    def update_flare_index(self):
+        "Indexes the flares of flight paths attached or changed since the last step"
+        for entity in self.world.changed("flight path", self.last_run):
+            if entity["flight path"] is not None:
+                self.index_flares(entity)
+
+    def index_flares(self, entity):
+        "Hides a flight path's flares and indexes them by position"
+        self.forget_flares(entity)
+        flares = self.indexed_flares[entity] = list(entity["flight path"].flares)
+        for s in flares:
+            s.visible = False
+            self.flare_hash.insert(s, V2(s.x, s.y), 0.0)
+        self.flares_reindexed = True
+
+    def forget_flares(self, entity, flight_path=None):
+        "Takes the flares of one flight path out of the index"
+        for s in self.indexed_flares.pop(entity, ()):
+            self.flare_hash.remove(s)
+            self.lit_flares.discard(s)
 
     def update_all_physics_objects(self):
-        dt = ecs.DELTA_TIME
+        dt = self.world.delta_time
         time_factor = dt / 0.01667
 
-        for entity in Entity.with_component("physics"):
-            physics = entity["physics"]
-
-            # Don't calculate velocity, position, acceleration,
-            # boost, gravity, etc. for static objects
-            if physics.static:
-                continue
-
-            mass_points = self.get_all_masses()
-
-            gravity = settings.GRAV_CONSTANT if settings.GRAVITY else 0.0
-            max_grav_acc = settings.MAX_GRAV_ACC if settings.GRAVITY else 0.0
+        gravity = settings.GRAV_CONSTANT if settings.GRAVITY else 0.0
+        max_grav_acc = settings.MAX_GRAV_ACC if settings.GRAVITY else 0.0
 
-            grav_acc = V2(0, 0)
-            for mass_point, mass in mass_points:
-                acc_vector = mass_point - physics.position
-                if acc_vector.length_squared > 0:
-                    acc_magnitude = gravity * mass / acc_vector.length_squared
-                    grav_acc += acc_vector.normalized * acc_magnitude
-
-            acc_magnitude = grav_acc.length
-            acc_magnitude = min(acc_magnitude, max_grav_acc)
-            if grav_acc.length_squared > 0.0:
-                grav_acc = grav_acc.normalized * acc_magnitude
-                physics.acceleration += grav_acc
-
-            physics.velocity *= 1 - (physics.drag_constant * time_factor)
-            physics.velocity += physics.acceleration * time_factor
-            physics.position += physics.velocity * time_factor
+        # Static objects aren't in the store, so no velocity, position,
+        # acceleration, boost, gravity, etc. gets calculated for them
+        store = self.store
+        store.gather()
+        if not len(store):
+            return
+        grid = self.grid
+        if grid is not None and not grid.matches(gravity, max_grav_acc):
+            # Baked with other settings, sum the static masses instead
+            grid = None
+        store.integrate(time_factor, gravity, max_grav_acc, grid)
+        store.scatter()
 
     def update_ship_controls(self):
-        dt = ecs.DELTA_TIME
+        dt = self.world.delta_time
         time_factor = dt / 0.01667
 
-        inputs = Entity.with_component("input")[0]["input"]
-        entity = get_ship_entity()
+        frame = self.world.frame
+        inputs = frame.input["input"]
+        entity = frame.ship
         physics = entity["physics"]
+        ship = entity["ship"]
 
-        rotation = physics.rotation
-        physics.acceleration = V2(0.0, 0.0)
-
-        if inputs.a:
-            if not settings.MOUSE_TURNING:
+        if not settings.MOUSE_TURNING:
+            rotation = physics.rotation
+            if inputs.a:
                 rotation += 4.5 * time_factor
-            else:
-                physics.acceleration += V2.from_degrees_and_length(rotation + 180, 0.4)
-
-        if inputs.d:
-            if not settings.MOUSE_TURNING:
+            if inputs.d:
                 rotation -= 4.5 * time_factor
-            else:
-                physics.acceleration += V2.from_degrees_and_length(rotation, 0.4)
-
-        if inputs.w or inputs.boost:
-            physics.acceleration += V2.from_degrees_and_length(rotation + 90, 1.0)
-
-        if inputs.s:
-            physics.acceleration += V2.from_degrees_and_length(rotation + 270, 0.4)
-
-        if not settings.MOUSE_TURNING:
             physics.rotation = rotation
 
-        acc_constant = physics.acc_constant if settings.ACCELERATION else 0.0
-        physics.acceleration *= acc_constant
-
-        ship = entity["ship"]
-
-        boost_constant = ship.boost_constant if settings.BOOST else 0.0
-
-        if inputs.boost and settings.BOOST and not physics.static:
+        boosting = (
+            inputs.boost
+            and settings.BOOST
+            and entity["dynamic"] is not None
+            and ship.boost > 0
+        )
+        physics.acceleration = engine_thrust(
+            inputs, physics.rotation, physics, ship, boosting
+        )
+
+        if inputs.boost and settings.BOOST and entity["dynamic"] is not None:
             if ship.boost > 0:
-                physics.acceleration *= boost_constant
                 ship.boost -= 0.5 * time_factor
                 ship.boosting = True
             else:
@@ -163,13 +290,12 @@ class PhysicsSystem(System):
             ship.boosting = False
 
     def update_camera_position(self):
-        dt = ecs.DELTA_TIME
+        dt = self.world.delta_time
         time_factor = dt / 0.01667
 
-        entity = get_ship_entity()
-        physics = entity["physics"]
-        window_entity = list(Entity.with_component("window"))[0]
-        window = window_entity["window"]
+        frame = self.world.frame
+        physics = frame.ship["physics"]
+        window = frame.window["window"]
         width, height = window.window.width, window.window.height
         if settings.CAMERA_SPRING:
             target_camera_position = physics.position + physics.velocity * 20 * (
@@ -185,11 +311,97 @@ class PhysicsSystem(System):
         else:
             window.camera_position = physics.position
 
+    def clear_trajectory(self):
+        "Drops the ship's forecast, it is rebuilt once the ship can move"
+        entity = self.world.frame.ship
+        trajectory = None if entity is None else entity["trajectory"]
+        if trajectory is None or trajectory.assumed is None:
+            return
+        trajectory.states.clear()
+        trajectory.assumed = None
+        self.world.mark_changed(entity, "trajectory")
+
+    def update_trajectory(self):
+        """Moves the ship's forecast on a step: the state it predicted for
+        this step is dropped if the ship got there, and the rest is kept.
+        Otherwise, or once the inputs change, it is rebuilt. Either way it
+        grows by at most STEPS_PER_UPDATE steps towards its horizon."""
+        frame = self.world.frame
+        entity = frame.ship
+        trajectory = entity["trajectory"]
+        if trajectory is None:
+            return
+        if entity["dynamic"] is None:
+            # Held in place, e.g. waiting at the start line
+            self.clear_trajectory()
+            return
+        states = trajectory.states
+
+        time_factor = self.world.delta_time / 0.01667
+        gravity = settings.GRAV_CONSTANT if settings.GRAVITY else 0.0
+        max_grav_acc = settings.MAX_GRAV_ACC if settings.GRAVITY else 0.0
+        grid = self.grid
+        if grid is not None and not grid.matches(gravity, max_grav_acc):
+            grid = None
+        physics = entity["physics"]
+        ship = entity["ship"]
+        thrust = engine_thrust(
+            frame.input["input"], physics.rotation, physics, ship, ship.boosting
+        )
+        assumed = (
+            thrust.x,
+            thrust.y,
+            physics.drag_constant,
+            time_factor,
+            gravity,
+            max_grav_acc,
+            grid,
+        )
+
+        if assumed != trajectory.assumed or self.predictor is None:
+            states.clear()
+            trajectory.assumed = assumed
+            statics = ()
+            if grid is None and gravity:
+                positions, masses = self.store.static_masses()
+                statics = [(*p, m) for p, m in zip(positions.tolist(), masses.tolist())]
+            moving = [
+                (*other["physics"].position, other["physics"].mass)
+                for other in self.bodies
+                if other["physics"].mass != 0.0 and other != entity
+            ]
+            self.predictor = Predictor(
+                (thrust.x, thrust.y),
+                physics.drag_constant,
+                time_factor,
+                gravity,
+                max_grav_acc,
+                grid,
+                statics,
+                moving,
+            )
+        elif states and not diverged(states[0], physics):
+            states.popleft()
+        else:
+            states.clear()
+
+        wanted = round(trajectory.horizon / self.world.delta_time)
+        grow = min(wanted - len(states), STEPS_PER_UPDATE)
+        if states:
+            state = states[-1]
+        else:
+            state = (*physics.position, *physics.velocity)
+        step = self.predictor.step
+        for _ in range(grow):
+            state = step(*state)
+            states.append(state)
+        self.world.mark_changed(entity, "trajectory")
+
     def update_ship_thrust_emitter(self):
-        dt = ecs.DELTA_TIME
+        dt = self.world.delta_time
         time_factor = dt / 0.01667
 
-        entity = get_ship_entity()
+        entity = self.world.frame.ship
         ship = entity["ship"]
         physics = entity["physics"]
         game_visual = entity["game visual"]
@@ -203,10 +415,14 @@ class PhysicsSystem(System):
         if emitter is None:
             return
 
+        boost_image = getattr(emitter, "boost_image", None)
+        if emitter.particles is None:
+            images = [emitter.image] if boost_image is None else [emitter.image, boost_image]
+            emitter.particles = Particles(images, emitter.batch, blend_dest=GL_ONE)
+        particles = emitter.particles
+
         if not emitter.enabled:
-            for sprite in emitter.sprites:
-                sprite.delete()
-            emitter.sprites = []
+            particles.clear()
             return
 
         if physics.acceleration.length > 0 and ship.boosting:
@@ -216,62 +432,87 @@ class PhysicsSystem(System):
         else:
             emitter.rate = 0.03
 
-        for sprite in emitter.sprites:
-            sprite.opacity *= 1 - (0.1 * time_factor)
-
-        to_be_deleted = [s for s in emitter.sprites if s.opacity < 0.01]
-        emitter.sprites = [s for s in emitter.sprites if s.opacity >= 0.01]
-        for sprite in to_be_deleted:
-            sprite.delete()
+        particles.fade(1 - (0.1 * time_factor))
 
         emitter.time_since_last_emission += dt
         if emitter.time_since_last_emission > emitter.rate:
             offset = V2.from_degrees_and_length(physics.rotation + 270, 16.0)
-            sprite = pyglet.sprite.Sprite(
-                emitter.image
-                if not (hasattr(emitter, "boost_image") and ship.boosting)
-                else emitter.boost_image,
-                x=physics.position.x + offset.x,
-                y=physics.position.y + offset.y,
-                batch=emitter.batch,
-                blend_src=pyglet.gl.GL_SRC_ALPHA,
-                blend_dest=pyglet.gl.GL_ONE,
+            particles.emit(
+                physics.position.x + offset.x,
+                physics.position.y + offset.y,
+                physics.rotation,
+                image=1 if boost_image is not None and ship.boosting else 0,
             )
-            sprite.rotation = -physics.rotation
-            emitter.sprites.append(sprite)
             emitter.time_since_last_emission = 0
 
     def update_ship_collision(self):
-        entity = get_ship_entity()
+        dt = self.world.delta_time
+        time_factor = dt / 0.01667
+
+        entity = self.world.frame.ship
         physics = entity["physics"]
 
         collision = entity["collision"]
         if collision is None:
             return
 
-        colliders = Entity.with_component("collision")
-        for collider in colliders:
+        # The ship is swept along the straight line it moved this step, so
+        # fast ships can't pass through small colliders between steps.
+        # Only moving bodies have their previous position kept up to date.
+        start = physics.previous_position
+        if start is None or entity["dynamic"] is None:
+            start = physics.position
+        end = physics.position
+        # Share of the step still to be moved after each bounce
+        remaining = 1.0
+        for _ in range(MAX_IMPACTS_PER_STEP):
+            impact = self.first_impact(entity, start, end, collision.circle_radius)
+            if impact is None:
+                break
+            t, collider_position, min_length = impact
 
+            contact = start + (end - start) * t
+            separation = contact - collider_position
+            if separation.length == 0:
+                break
+            n = separation.normalized
+            # Exactly on the surface, so rounding can't leave it inside
+            contact = collider_position + n * min_length
+
+            v = physics.velocity
+            a = n * (v.dot_product(n))
+            physics.velocity = (v - (a * 1.3)) * 0.9
+
+            impact_amount = (v - physics.velocity).length
+            if impact_amount > 1:
+                System.dispatch(event="PlayFX", fx="collision", volume=min(impact_amount / 10, 1.0))
+
+            if t == 0:
+                # Started inside, push out the way the discrete test did,
+                # without moving on with the bounced velocity this step
+                end = contact
+                break
+            # The rest of the step is moved with the bounced velocity
+            remaining *= 1 - t
+            start = contact
+            end = contact + physics.velocity * time_factor * remaining
+        physics.position = end
+
+    def first_impact(self, entity, start, end, radius):
+        """Earliest collider the swept ship touches between start and end,
+        as (time of impact, collider position, summed radii), or None"""
+        move = end - start
+        middle = start + move * 0.5
+        nearby = self.collision_hash.nearby(middle, move.length * 0.5 + radius)
+        first = None
+        # Same order every run, so ties go to the same collider
+        for collider in sorted(nearby, key=lambda e: e.entity_id):
             if collider.entity_id == entity.entity_id:
                 # Don't collide with self
                 continue
-
-            collider_collision = collider["collision"]
-            collider_physics = collider["physics"]
-            collider_checkpoint = collider["checkpoint"]
-            if collider_physics is None:
-                continue
-
-            separation = physics.position - collider_physics.position
-            sep_length = separation.length
-            min_length = collision.circle_radius + collider_collision.circle_radius
-            if sep_length < min_length:
-                n = separation.normalized
-                v = physics.velocity
-                a = n * (v.dot_product(n))
-                physics.position += separation.normalized * (min_length - sep_length)
-                physics.velocity = (v - (a * 1.3)) * 0.9
-
-                impact_amount = (v - physics.velocity).length 
-                if impact_amount > 1:
-                    System.dispatch(event="PlayFX", fx="collision", volume=min(impact_amount / 10, 1.0))
+            collider_position = collider["physics"].position
+            min_length = radius + collider["collision"].circle_radius
+            t = time_of_impact(start, end, collider_position, min_length)
+            if t is not None and (first is None or t < first[0]):
+                first = (t, collider_position, min_length)
+        return first
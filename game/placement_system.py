@@ -0,0 +1,140 @@
+import os
+import json
+
+import pyglet
+
+from .settings import settings
+from .cartography_system import SELECTIONS
+from .common import *
+from .components import Visual, UIVisualComponent
+from .ecs import *
+from .pool import POOL
+from .vector import V2
+
+
+class PlacementSystem(System):
+    """Places objects and checkpoints on the active map in editing mode.
+    Built the first time placements start."""
+
+    reads = ()
+    writes = ()
+
+    def setup(self):
+        self.subscribe("StartPlacements", self.handle_start_placements)
+        self.subscribe("StopPlacements", self.handle_stop_placements)
+        self.subscribe("PlacementSelection", self.handle_placement_selection)
+        self.subscribe("Place", self.handle_place)
+        # Objects are loaded the same way the map loads them
+        self.cartography = self.world.systems["CartographySystem"]
+
+    def handle_start_placements(self, **kwargs):
+        map_entity = get_active_map_entity()
+        map_ = map_entity["map"]
+        with open(os.path.join("maps", f"{map_.map_name}_objects.json"), "r") as f:
+            data = f.read()
+        map_.map_objects = json.loads(data)
+        map_.mode = "editing"
+        settings.GRAVITY = False
+
+        entity = Entity()
+        map_.edit_selection_id = entity.entity_id
+        selection = SELECTIONS[map_.edit_selection_index]
+        label = POOL.label(
+            selection[0], font_size=36, x=20, y=20, anchor_x="left", anchor_y="bottom"
+        )
+        entity.attach(
+            UIVisualComponent(visuals=[Visual(kind="label", z_sort=0, value=label)])
+        )
+
+        # Load flight path data in so we can add checkpoints
+        with open(os.path.join("maps", f"wip_path.json"), "r") as f:
+            map_path_data = f.read()
+        map_.flight_path = json.loads(map_path_data)
+
+    def handle_stop_placements(self, **kwargs):
+        settings.GRAVITY = True
+        map_entity = get_active_map_entity()
+        if not map_entity:
+            return
+
+        map_ = map_entity["map"]
+        if not map_.mode == "editing":
+            return
+
+        map_.mode = "freeplay"
+
+        with open(os.path.join("maps", f"{map_.map_name}_objects.json"), "w") as f:
+            f.write(json.dumps(map_.map_objects, indent=2))
+
+        with open(os.path.join("maps", f"{map_.map_name}_path.json"), "w") as f:
+            f.write(json.dumps(map_.flight_path, indent=2))
+
+        System.dispatch(event="LoadMap", map_name=map_.map_name, mode="freeplay")
+        Entity.find(map_.edit_selection_id).destroy()
+
+    def handle_place(self, *, position, map_entity_id, **kwargs):
+        map_entity = Entity.find(map_entity_id)
+        if not map_entity:
+            return
+
+        map_ = map_entity["map"]
+        if not map_.mode == "editing":
+            return
+
+        object_name, mass, radius = SELECTIONS[map_.edit_selection_index]
+        if object_name == "checkpoint":
+            points = [
+                ((position - V2(p["x"], p["y"])).length_squared, p)
+                for p in map_.flight_path
+            ]
+            closest_distance = min(x[0] for x in points)
+            closest_point = [p for d, p in points if d == closest_distance][0]
+            if "check_point" not in closest_point:
+                closest_point["checkpoint"] = True
+
+                point_index = map_.flight_path.index(closest_point)
+                if point_index == 0:
+                    p1 = map_.flight_path[point_index + 1]
+                    p2 = map_.flight_path[point_index]
+                else:
+                    p1 = map_.flight_path[point_index]
+                    p2 = map_.flight_path[point_index - 1]
+
+                p1 = V2(p1["x"], p1["y"])
+                p2 = V2(p2["x"], p2["y"])
+                rotation = (p1 - p2).degrees - 90
+                num_points = sum(1 for p in map_.flight_path if "checkpoint" in p)
+                self.cartography.load_checkpoint(
+                    V2(closest_point["x"], closest_point["y"]),
+                    rotation,
+                    num_points,
+                    map_entity_id,
+                )
+
+        elif mass is not None and radius is not None:
+            map_.map_objects.append(
+                {"object": object_name, "x": position.x, "y": position.y}
+            )
+            self.cartography.load_object(object_name, position, mass, radius)
+
+    def handle_placement_selection(self, *, direction, **kwargs):
+        map_entity = get_active_map_entity()
+        if not map_entity:
+            return
+
+        map_ = map_entity["map"]
+        if not map_.mode == "editing":
+            return
+
+        if direction == "up":
+            map_.edit_selection_index = (
+                map_.edit_selection_index - 1
+            ) % len(SELECTIONS)
+        elif direction == "down":
+            map_.edit_selection_index = (
+                map_.edit_selection_index + 1
+            ) % len(SELECTIONS)
+        object_name, mass, radius = SELECTIONS[map_.edit_selection_index]
+        Entity.find(map_.edit_selection_id)["ui visual"].visuals[
+            0
+        ].value.text = object_name
@@ -0,0 +1,164 @@
+import pyglet
+
+# pyglet.gl's blend factors, copied so asking for one doesn't load GL
+GL_ONE = 0x0001
+GL_SRC_ALPHA = 0x0302
+GL_ONE_MINUS_SRC_ALPHA = 0x0303
+
+
+class StandIn:
+    """Takes the place of a sprite, label, image or vertex list when nothing
+    is drawn. Whatever is assigned to it is kept, so it reads back."""
+
+    width = 0
+    height = 0
+    anchor_x = 0
+    anchor_y = 0
+
+    def __init__(self, image=None, x=0, y=0, text="", **kwargs):
+        self.image = image
+        self.x = x
+        self.y = y
+        self.text = text
+        self.rotation = 0
+        self.scale = 1
+        self.opacity = 255
+        self.visible = True
+        self.__dict__.update(kwargs)
+
+    def update(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+    def begin_update(self):
+        pass
+
+    def end_update(self):
+        pass
+
+    def delete(self):
+        pass
+
+
+class Pool:
+    """Hands out sprites and labels, reusing ones given back before
+
+    Loading a map builds hundreds of sprites and a race restart would
+    otherwise throw them all away. Sprites are pooled per image, batch and
+    blend mode, labels per set of constructor arguments. Released sprites
+    are hidden, so ones sharing a batch stop drawing right away.
+
+    A headless pool hands out StandIns instead and never touches GL.
+
+    sprite = POOL.sprite(ASSETS["moon"], x=10, y=20)
+    ...
+    POOL.release(sprite)
+    """
+
+    def __init__(self):
+        # Key -> objects ready to be handed out again
+        self.free = {}
+        # Object handed out -> its key
+        self.keys = {}
+        self.created = 0
+        self.reused = 0
+        self.headless = False
+
+    def sprite(
+        self,
+        image,
+        x=0,
+        y=0,
+        batch=None,
+        blend_src=GL_SRC_ALPHA,
+        blend_dest=GL_ONE_MINUS_SRC_ALPHA,
+        subpixel=False,
+    ):
+        if self.headless:
+            return StandIn(image, x=x, y=y)
+        key = ("sprite", image, batch, blend_src, blend_dest, subpixel)
+        free = self.free.get(key)
+        if free:
+            sprite = free.pop()
+            if sprite.image is not image:
+                sprite.image = image
+            sprite.update(x=x, y=y, rotation=0, scale=1, scale_x=1, scale_y=1)
+            sprite.opacity = 255
+            sprite.color = (255, 255, 255)
+            sprite.visible = True
+            self.reused += 1
+        else:
+            sprite = pyglet.sprite.Sprite(
+                image,
+                x=x,
+                y=y,
+                batch=batch,
+                blend_src=blend_src,
+                blend_dest=blend_dest,
+                subpixel=subpixel,
+            )
+            self.created += 1
+        self.keys[sprite] = key
+        return sprite
+
+    def label(self, text="", **kwargs):
+        if self.headless:
+            return StandIn(text=text, **kwargs)
+        key = ("label",) + tuple(sorted(kwargs.items()))
+        free = self.free.get(key)
+        if free:
+            label = free.pop()
+            # Color goes first, it can't be set while an update is batched
+            label.color = kwargs.get("color", (255, 255, 255, 255))
+            label.begin_update()
+            label.text = text
+            label.x = kwargs.get("x", 0)
+            label.y = kwargs.get("y", 0)
+            label.end_update()
+            self.reused += 1
+        else:
+            label = pyglet.text.Label(text, **kwargs)
+            self.created += 1
+        self.keys[label] = key
+        return label
+
+    def batch(self):
+        return None if self.headless else pyglet.graphics.Batch()
+
+    def vertex_list(self, count, *data):
+        "Not pooled, a vertex list that goes headless along with the sprites"
+        if self.headless:
+            return StandIn()
+        return pyglet.graphics.vertex_list(count, *data)
+
+    def release(self, value):
+        "Takes back a sprite or label, anything the pool didn't hand out is ignored"
+        if self.headless:
+            return
+        if not isinstance(value, (pyglet.sprite.Sprite, pyglet.text.Label)):
+            return
+        key = self.keys.pop(value, None)
+        if key is None:
+            return
+        if key[0] == "sprite":
+            value.visible = False
+        self.free.setdefault(key, []).append(value)
+
+    def release_visuals(self, entity, component):
+        "Removal hook for game and ui visual components"
+        for visual in component.visuals:
+            value = visual.value
+            # Real time labels and menus hold theirs in a dict or list
+            if isinstance(value, dict):
+                value = value.values()
+            elif not isinstance(value, list):
+                value = (value,)
+            for item in value:
+                self.release(item)
+
+    def release_flares(self, entity, component):
+        "Removal hook for flight path components"
+        for flare in component.flares:
+            self.release(flare)
+
+
+POOL = Pool()
@@ -0,0 +1,94 @@
+import json
+import time
+
+from collections import deque
+from threading import Lock
+
+
+class Profiler:
+    """Records wall time per system update and per event handler
+
+    Timings are kept over a rolling window of the most recent calls so the
+    percentiles follow what the game is doing right now. While disabled the
+    only cost to callers is checking ``enabled``.
+
+    PROFILER.enable(stats_path="profile_stats.json")
+    ...
+    PROFILER.stats()["system:PhysicsSystem"]["p95"]
+    """
+
+    def __init__(self, window=600):
+        self.enabled = False
+        self.window = window
+        # Label -> deque of the most recent durations in seconds
+        self.samples = {}
+        # Label -> total number of calls since enabled
+        self.calls = {}
+        self.stats_path = None
+        self.dump_interval = 5.0
+        self.last_dump = 0.0
+        self.lock = Lock()
+
+    def enable(self, stats_path=None, dump_interval=5.0):
+        self.stats_path = stats_path
+        self.dump_interval = dump_interval
+        self.last_dump = time.monotonic()
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self.lock:
+            self.samples = {}
+            self.calls = {}
+
+    def record(self, label, elapsed):
+        with self.lock:
+            samples = self.samples.get(label)
+            if samples is None:
+                samples = self.samples[label] = deque(maxlen=self.window)
+            samples.append(elapsed)
+            self.calls[label] = self.calls.get(label, 0) + 1
+
+    def percentiles(self, label):
+        "Returns calls, mean, p50, p95 and p99 in milliseconds for a label"
+        with self.lock:
+            samples = sorted(self.samples.get(label, ()))
+            calls = self.calls.get(label, 0)
+        if not samples:
+            return None
+
+        def percentile(p):
+            index = min(len(samples) - 1, int(p / 100 * len(samples)))
+            return samples[index] * 1000
+
+        return {
+            "calls": calls,
+            "mean": sum(samples) / len(samples) * 1000,
+            "p50": percentile(50),
+            "p95": percentile(95),
+            "p99": percentile(99),
+        }
+
+    def stats(self):
+        with self.lock:
+            labels = list(self.samples)
+        return {label: self.percentiles(label) for label in sorted(labels)}
+
+    def dump(self, path=None):
+        path = path or self.stats_path
+        with open(path, "w") as f:
+            f.write(json.dumps(self.stats(), indent=2))
+
+    def maybe_dump(self):
+        "Writes the stats file if dump_interval has passed since the last one"
+        if self.stats_path is None:
+            return
+        now = time.monotonic()
+        if now - self.last_dump >= self.dump_interval:
+            self.last_dump = now
+            self.dump()
+
+
+PROFILER = Profiler()
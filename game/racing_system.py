@@ -1,7 +1,6 @@
 import json
 import os
 import pyglet
-import time
 
 from itertools import cycle
 
@@ -10,25 +9,56 @@ from .assets import ASSETS
 from .common import *
 from .components import (
     PhysicsComponent,
+    DynamicComponent,
     GameVisualComponent,
     UIVisualComponent,
     CountdownComponent,
     Visual,
     FlightPathComponent,
+    RacingLine,
 )
 from . import ecs
 from .ecs import *
+from .pool import POOL
+from .snapshot import snapshot, restore
 from .vector import *
 
 from pyglet import clock
 
 
 class RacingSystem(System):
+    reads = (
+        "map",
+        "countdown",
+        "ship",
+        "physics",
+        "checkpoint",
+        "game visual",
+        "ui visual",
+    )
+    writes = (
+        "map",
+        "countdown",
+        "physics",
+        "checkpoint",
+        "game visual",
+        "ui visual",
+    )
+    fixed_step = True
+    # New personal bests are written to records/, off for test runs
+    save_records = True
+
     def setup(self):
         self.subscribe("MapLoaded", self.handle_map_loaded)
+        # Has to run after handle_map_loaded has set the race up
+        self.subscribe("MapLoaded", self.handle_save_restart_point)
+        self.subscribe("RestartMap", self.handle_restart_map)
         self.subscribe("RaceStart", self.handle_race_start)
         self.subscribe("RaceComplete", self.handle_race_complete)
         self.subscribe("ExitMap", self.handle_exit_map)
+        self.maps = self.world.query("map")
+        self.countdowns = self.world.query("countdown", "ui visual")
+        self.checkpoints = self.world.query("physics", "checkpoint", "game visual")
 
     def handle_exit_map(self, *, map_entity_id, **kwargs):
         map_entity = Entity.find(map_entity_id)
@@ -49,10 +79,11 @@ class RacingSystem(System):
 
         if map_.mode != "racing":
             # Unfreeze the ship
-            ship_entity["physics"].static = False
+            ship_entity.attach(DynamicComponent())
             return
 
-        ship_entity["physics"].static = True
+        # Freeze the ship until the countdown finishes
+        ship_entity.detach("dynamic")
 
         def get_avg_speed(over_ticks):
             nonlocal ship_entity
@@ -71,7 +102,7 @@ class RacingSystem(System):
             return inner
 
         speedometer_entity = Entity()
-        label = pyglet.text.Label(
+        label = POOL.label(
             "SPEED", font_size=36, x=0, y=0, anchor_x="center", anchor_y="bottom"
         )
         speedometer_entity.attach(
@@ -101,25 +132,64 @@ class RacingSystem(System):
             with open(
                 os.path.join("records", f"{map_.map_name}_pb_line.json"), "r"
             ) as f:
-                map_.pb_racing_line = json.loads(f.read())
+                map_.pb_racing_line = RacingLine(json.loads(f.read()))
         except:
             return
 
         map_.pb_line_entity_id = self.create_pb_line(map_)
         map_.pb_ghost_entity_id = self.create_pb_ghost()
 
+    def handle_save_restart_point(self, *, map_entity_id, **kwargs):
+        map_entity = Entity.find(map_entity_id)
+        map_ = map_entity["map"]
+        if map_.mode == "racing":
+            map_.restart_snapshot = snapshot()
+
+    def handle_restart_map(self, *, map_entity_id, **kwargs):
+        map_entity = Entity.find(map_entity_id)
+        if not map_entity:
+            return
+        map_ = map_entity["map"]
+
+        if map_.restart_snapshot is None:
+            System.dispatch(event="LoadMap", map_name=map_.map_name, mode=map_.mode)
+            return
+
+        restore(map_.restart_snapshot)
+
+        # The countdown is destroyed once the race gets going
+        if Entity.find(map_.race_countdown_id) is None:
+            self.create_countdown(map_)
+
+        for entity in self.checkpoints:
+            cp = entity["checkpoint"]
+            if cp.map_entity_id != map_entity_id:
+                continue
+            game_visual = entity["game visual"]
+            visuals = list(sorted(game_visual.visuals, key=lambda v: v.z_sort))
+            top_visual = visuals[1]
+            bottom_visual = visuals[0]
+            if cp.cp_order == 0:
+                top_visual.value.image = ASSETS["checkpoint_top"]
+                bottom_visual.value.image = ASSETS["checkpoint_bottom"]
+            else:
+                top_visual.value.image = ASSETS["checkpoint_next_top"]
+                bottom_visual.value.image = ASSETS["checkpoint_next_bottom"]
+
+        System.dispatch(event="CenterCamera")
+
     def create_countdown(self, map_):
         countdown_entity = Entity()
         countdown_entity.attach(
             CountdownComponent(
                 purpose="race",
-                started_at=time.monotonic(),
+                started_at=self.world.clock,
                 duration=6.0,
             )
         )
         window = get_window()
         x, y = window.window.width / 2, window.window.height
-        label = pyglet.text.Label(
+        label = POOL.label(
             "GET READY", font_size=36, x=x, y=y, anchor_x="center", anchor_y="top"
         )
         visual = Visual(kind="label", z_sort=0, value=label)
@@ -137,14 +207,14 @@ class RacingSystem(System):
     def handle_race_start(self, *, map_entity_id, **kwargs):
         # Unfreeze the ship
         ship_entity = get_ship_entity()
-        ship_entity["physics"].static = False
+        ship_entity.attach(DynamicComponent())
 
         # Set the race start time if map exists
         map_entity = Entity.find(map_entity_id)
         if not map_entity:
             return
         map_ = map_entity["map"]
-        start_time = time.monotonic()
+        start_time = self.world.clock
         map_.race_start_time = start_time
 
         # Record the first racing line point
@@ -171,6 +241,8 @@ class RacingSystem(System):
         current_record = records.get(map_.map_name)
 
         # Check the record and update it if we've beaten it
+        if not self.save_records:
+            return
         if current_record is None or new_time < current_record:
             records[map_.map_name] = new_time
             with open(os.path.join("records", "pb_times.json"), "w") as f:
@@ -180,16 +252,19 @@ class RacingSystem(System):
             with open(
                 os.path.join("records", f"{map_.map_name}_pb_line.json"), "w"
             ) as f:
-                f.write(json.dumps(map_.racing_line))
+                f.write(json.dumps(map_.racing_line.points()))
+
+            # The ghost needs to chase the new line, so reload next time
+            map_.restart_snapshot = None
 
     def update(self):
-        for map_entity in Entity.with_component("map"):
+        for map_entity in self.maps:
             self.update_countdown(map_entity)
             map_ = map_entity["map"]
             if settings.physics_frozen:
                 if map_.race_start_time is not None:
-                    map_.race_start_time += ecs.DELTA_TIME
-            current_time = time.monotonic()
+                    map_.race_start_time += self.world.delta_time
+            current_time = self.world.clock
             if len(map_.racing_line) > 0:
                 self.record_racing_line_point(map_, current_time)
 
@@ -199,14 +274,13 @@ class RacingSystem(System):
 
     def update_ghost(self, map_, current_time):
         dt = current_time - map_.race_start_time
-        points = enumerate(map_.pb_racing_line)
-        ghost_point = list(filter((lambda x: x[1]["dt"] > dt), points))
+        line = map_.pb_racing_line
+        i = line.index_after(dt)
 
         # Ghost already finished the race
-        if len(ghost_point) == 0:
+        if i == len(line):
             return
 
-        i, p = ghost_point[0]
         ghost_entity = Entity.find(map_.pb_ghost_entity_id)
         # We didn't find a ghost, nothing to update
         if ghost_entity is None:
@@ -214,23 +288,23 @@ class RacingSystem(System):
 
         # Update the position and rotation of the ghost via interpolation
         physics = ghost_entity["physics"]
+        physics.previous_position = physics.position
+        physics.previous_rotation = physics.rotation
         if i == 0:
-            physics.position = V2(p["x"], p["y"])
-            physics.rotation = p["r"]
+            physics.position = line.position(0)
+            physics.rotation = line.r[0]
         else:
-            p0 = map_.pb_racing_line[i - 1]
-            p1 = p
-            dt_t = p1["dt"] - p0["dt"]
-            dt_p = dt - p0["dt"]
+            dt_t = line.dt[i] - line.dt[i - 1]
+            dt_p = dt - line.dt[i - 1]
             a = dt_p / dt_t
-            x = p0["x"] * (1 - a) + p1["x"] * a
-            y = p0["y"] * (1 - a) + p1["y"] * a
-            r = p0["r"] * (1 - a) + p1["r"] * a
+            x = line.x[i - 1] * (1 - a) + line.x[i] * a
+            y = line.y[i - 1] * (1 - a) + line.y[i] * a
+            r = line.r[i - 1] * (1 - a) + line.r[i] * a
             physics.position = V2(x, y)
             physics.rotation = r
 
     def update_countdown(self, map_entity):
-        for entity in Entity.with_component("countdown"):
+        for entity in self.countdowns:
             countdown = entity["countdown"]
             map_ = map_entity["map"]
 
@@ -245,13 +319,15 @@ class RacingSystem(System):
 
             label = entity["ui visual"].visuals[0].value
 
-            time_left = (countdown.duration + countdown.started_at) - time.monotonic()
+            # Simulation time, so countdowns last the same number of steps
+            now = self.world.clock
+            time_left = (countdown.duration + countdown.started_at) - now
             if settings.physics_frozen:
                 # If physics are frozen, extend duration of any running countdown
                 # and re-calculate time_left before displaying the timer
                 # so that it'll re-start when physics get unfrozen
                 countdown.started_at += countdown.last_evaluated - time_left
-                time_left = (countdown.duration + countdown.started_at) - time.monotonic()
+                time_left = (countdown.duration + countdown.started_at) - now
             if time_left > 3.0:
                 label.text = "Get Ready!"
             elif time_left > 2.0:
@@ -286,27 +362,20 @@ class RacingSystem(System):
         position = entity["physics"].position
         rotation = entity["physics"].rotation
 
+        line = map_.racing_line
         if (
-            len(map_.racing_line) == 0
-            or (
-                V2(map_.racing_line[-1]["x"], map_.racing_line[-1]["y"]) - position
-            ).length
-            > 50
+            len(line) == 0
+            or (line.position(-1) - position).length > 50
             or final_point
         ):
-            map_.racing_line.append(
-                {
-                    "x": position.x,
-                    "y": position.y,
-                    "r": rotation,
-                    "dt": at_time - map_.race_start_time,
-                }
+            line.append(
+                position.x, position.y, rotation, at_time - map_.race_start_time
             )
 
     def create_pb_ghost(self):
         entity = Entity()
         entity.attach(PhysicsComponent(position=V2(0, 0), rotation=0))
-        sprite = pyglet.sprite.Sprite(ASSETS[settings.selected_ship], x=0, y=0, subpixel=True)
+        sprite = POOL.sprite(ASSETS[settings.selected_ship], subpixel=True)
         sprite.opacity = 127
         sprite.scale = 0.25
         game_visuals = [Visual(kind="sprite", z_sort=-10.0, value=sprite)]
@@ -315,7 +384,8 @@ class RacingSystem(System):
 
     def create_pb_line(self, map_):
         entity = Entity()
-        points = [V2(p["x"], p["y"]) for p in map_.pb_racing_line]
+        line = map_.pb_racing_line
+        points = [line.position(i) for i in range(len(line))]
         points_p = []
         for p in points:
             points_p.append(p.x)
@@ -325,7 +395,7 @@ class RacingSystem(System):
         fp_line_visual = Visual(
             kind="flight path",
             z_sort=-10.0,
-            value=pyglet.graphics.vertex_list(
+            value=POOL.vertex_list(
                 len(points),
                 ("v2f", points_p),
                 (
@@ -339,8 +409,8 @@ class RacingSystem(System):
         return entity.entity_id
 
     def update_checkpoints(self, map_entity):
-        entities = Entity.with_component("checkpoint")
-        ship_entity = get_ship_entity()
+        entities = self.checkpoints
+        ship_entity = self.world.frame.ship
         ship_physics = ship_entity["physics"]
         next_cp = self.get_next_cp(entities)
         last_cp = self.get_last_cp(entities)
@@ -369,7 +439,7 @@ class RacingSystem(System):
                 cp.is_next = False
                 if cp.cp_order == last_cp:
                     map_ = map_entity["map"]
-                    map_.race_end_time = time.monotonic()
+                    map_.race_end_time = self.world.clock
                     System.dispatch(
                         event="RaceComplete",
                         map_name=map_.map_name,
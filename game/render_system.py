@@ -1,24 +1,86 @@
 import os
 import math
 
+import numpy as np
 import pyglet
 
 from . import ecs
 from .settings import settings
 from .ecs import *
+from .pool import POOL
+from .spatial import FLARE_DISTANCE
 from .common import *
 from .coordinates import *
 from .vector import *
 
 
 class RenderSystem(System):
+    reads = (
+        "window",
+        "ship",
+        "physics",
+        "checkpoint",
+        "menu",
+        "flight path",
+        "game visual",
+        "ui visual",
+        "trajectory",
+    )
+    writes = ("game visual", "ui visual")
+
     def setup(self):
         pyglet.gl.glEnable(pyglet.gl.GL_LINE_SMOOTH)
         pyglet.gl.glHint(pyglet.gl.GL_LINE_SMOOTH_HINT, pyglet.gl.GL_NICEST)
+        self.game_visuals = self.world.query("game visual")
+        self.ui_visuals = self.world.query("ui visual")
+        # Pooled sprites and labels go back to the pool with their entity
+        self.world.on_remove("game visual", POOL.release_visuals)
+        self.world.on_remove("ui visual", POOL.release_visuals)
+        self.world.on_remove("flight path", POOL.release_flares)
+        # Camera position interpolated for the frame being drawn
+        self.camera_position = V2(0, 0)
+        # The ship's predicted path, updated whenever the forecast changes
+        self.trajectory_line = None
+
+    def interpolate(self, current, previous):
+        alpha = self.world.interpolation_alpha
+        if previous is None or alpha >= 1.0:
+            return current
+        return previous + (current - previous) * alpha
+
+    def interpolate_rotation(self, current, previous):
+        alpha = self.world.interpolation_alpha
+        if previous is None or alpha >= 1.0:
+            return current
+        # Turn the short way round
+        turn = (current - previous + 180) % 360 - 180
+        return previous + turn * alpha
+
+    def sync_sprites(self):
+        """Moves the sprites of bodies that changed since the last frame, and
+        of bodies that moved in the latest fixed step while interpolating.
+        Nothing that stays put is touched after its first frame."""
+        since = min(self.last_run, self.world.step_tick)
+        moved = set(self.game_visuals.changed("physics", since))
+        moved.update(self.game_visuals.changed("game visual", since))
+        for entity in moved:
+            physics = entity["physics"]
+            if physics is None:
+                continue
+            position = self.interpolate(physics.position, physics.previous_position)
+            rotation = self.interpolate_rotation(
+                physics.rotation, physics.previous_rotation
+            )
+            for visual in entity["game visual"].visuals:
+                if visual.kind == "sprite":
+                    sprite = visual.value
+                    sprite.x = position.x
+                    sprite.y = position.y
+                    sprite.rotation = float(-rotation)
 
     def render_bg(self, window):
         width, height = window.window.width, window.window.height
-        camera = window.camera_position
+        camera = self.camera_position
         layer_paralax = [10, 8, 2]
         for paralax, sprite in zip(layer_paralax, window.background_layers):
 
@@ -42,7 +104,7 @@ class RenderSystem(System):
                     sprite.draw()
 
     def camera_offset(self, window):
-        camera = window.camera_position
+        camera = self.camera_position
         width, height = window.window.width, window.window.height
 
         zoom = window.camera_zoom
@@ -71,6 +133,46 @@ class RenderSystem(System):
     def draw_flight_path_line(self, window, entity, visual):
         visual.value.draw(pyglet.gl.GL_LINE_STRIP)
 
+    def draw_trajectory(self, ship_entity):
+        trajectory = ship_entity["trajectory"]
+        if trajectory is None:
+            return
+        states = trajectory.states
+        count = len(states)
+        if settings.PHYSICS_FROZEN or count < 2:
+            if self.trajectory_line is not None:
+                self.trajectory_line.delete()
+                self.trajectory_line = None
+            return
+
+        line = self.trajectory_line
+        if line is None or line.get_size() < count:
+            if line is not None:
+                line.delete()
+            line = self.trajectory_line = self.create_trajectory_line(
+                max(count, round(trajectory.horizon / ecs.FIXED_DELTA_TIME))
+            )
+        elif not self.world.has_changed(ship_entity, "trajectory", self.last_run):
+            line.draw(pyglet.gl.GL_LINE_STRIP)
+            return
+
+        # The forecast moves on a step at a time, so the points are
+        # rewritten in place rather than the list remade
+        vertices = np.ctypeslib.as_array(line.vertices).reshape(-1, 2)
+        vertices[:count] = [(x, y) for x, y, _, _ in states]
+        # Points past the end of the forecast sit on its last one
+        vertices[count:] = vertices[count - 1]
+        line.draw(pyglet.gl.GL_LINE_STRIP)
+
+    def create_trajectory_line(self, size):
+        # Fades out towards the end of the horizon
+        colors = []
+        for i in range(size):
+            colors.extend((255, 255, 255, int(120 * (1 - i / size))))
+        return pyglet.graphics.vertex_list(
+            size, ("v2f/stream", [0.0] * size * 2), ("c4B/static", colors)
+        )
+
     def draw_emitter(self, window, entity, visual):
         visual.value.batch.draw()
 
@@ -87,10 +189,9 @@ class RenderSystem(System):
         ship_physics = ship_entity["physics"]
         sprite = visual.value
         distance = (ship_physics.position - physics.position).length
-        fade_distance = 700
-        if distance > fade_distance:
+        if distance > FLARE_DISTANCE:
             return
-        sprite.opacity = int((1 - (distance / fade_distance)) * 255)
+        sprite.opacity = int((1 - (distance / FLARE_DISTANCE)) * 255)
         sprite.draw()
 
     def draw_sprite(self, window, entity, visual):
@@ -216,7 +317,7 @@ class RenderSystem(System):
 
     def draw_checkpoint_arrow(self, window, entity, visual):
         width, height = window.window.width, window.window.height
-        camera = window.camera_position
+        camera = self.camera_position
         cp = entity["checkpoint"]
         physics = entity["physics"]
         arrow = entity["ui visual"].visuals[0].value
@@ -246,7 +347,7 @@ class RenderSystem(System):
             ):
                 # Clamp arrow to on the screen edge
 
-                entity = get_ship_entity()
+                entity = self.world.frame.ship
                 ship_physics = entity["physics"]
 
                 ship_x, ship_y = world_to_screen(
@@ -307,20 +408,26 @@ class RenderSystem(System):
                     arrow.draw()
 
     def update(self):
-        ship_entity = get_ship_entity()
-        window = get_window()
-
+        frame = self.world.frame
+        ship_entity = frame.ship
+        window = frame.window["window"]
+        self.camera_position = self.interpolate(
+            window.camera_position, window.previous_camera_position
+        )
+
+        self.sync_sprites()
         self.render_bg(window)
 
         self.camera_offset(window)
 
         width, height = window.window.width, window.window.height
-        pan_x, pan_y = window.camera_position.x, window.camera_position.y
+        pan_x, pan_y = self.camera_position.x, self.camera_position.y
         zoom = window.camera_zoom
 
-        entities = Entity.with_component("game visual")
+        self.draw_trajectory(ship_entity)
+
         visuals = []
-        for entity in entities:
+        for entity in self.game_visuals:
             for visual in entity["game visual"].visuals:
                 visuals.append((entity, visual))
 
@@ -330,12 +437,7 @@ class RenderSystem(System):
             elif visual.kind == "flare":
                 self.draw_flare(window, entity, visual, ship_entity)
             elif visual.kind == "sprite":
-                physics = entity["physics"]
                 sprite = visual.value
-                if physics is not None:
-                    sprite.x = physics.position.x
-                    sprite.y = physics.position.y
-                    sprite.rotation = float(-physics.rotation)
                 x, y = world_to_screen(
                     sprite.x, sprite.y,
                     width, height,
@@ -355,9 +457,8 @@ class RenderSystem(System):
 
         self.reset_camera(window)
 
-        entities = Entity.with_component("ui visual")
         visuals = []
-        for entity in entities:
+        for entity in self.ui_visuals:
             for visual in entity["ui visual"].visuals:
                 visuals.append((entity, visual))
 
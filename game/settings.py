@@ -1,19 +1,51 @@
 import json
 
+# Settings a fresh settings.json holds, which headless runs and benchmarks
+# use instead of the player's
+DEFAULTS = {
+    "acceleration": True,
+    "boost": True,
+    "camera_spring": True,
+    "gravity": True,
+    "grav_constant": 100.0,
+    "max_grav_acc": 0.18,
+    "mouse_turning": True,
+    "physics_frozen": True,
+    "selected_ship": "BMS-12",
+    "audio": True,
+}
+
 
 class Settings:
-    def __init__(self):
-        with open("settings.json", "r") as f:
+    def __init__(self, path="settings.json"):
+        # Where changes are saved, None keeps them in memory
+        object.__setattr__(self, "_path", path)
+        with open(path, "r") as f:
             object.__setattr__(self, "_settings", json.loads(f.read()))
 
     def __setattr__(self, name, value):
         s = object.__getattribute__(self, "_settings")
         s[name.lower()] = value
-        with open("settings.json", "w") as f:
-            f.write(json.dumps(self._settings, indent=2))
+        path = object.__getattribute__(self, "_path")
+        if path is not None:
+            with open(path, "w") as f:
+                f.write(json.dumps(self._settings, indent=2))
 
     def __getattr__(self, name):
         return object.__getattribute__(self, "_settings")[name.lower()]
 
+    def in_memory(self, **overrides):
+        """Replaces every setting with DEFAULTS and any overrides, and stops
+        saving changes, for the rest of the process. Runs then neither
+        depend on nor rewrite settings.json.
+
+        settings.in_memory(selected_ship="BMS-12", gravity=False)
+        """
+        values = dict(DEFAULTS)
+        for name, value in overrides.items():
+            values[name.lower()] = value
+        object.__setattr__(self, "_path", None)
+        object.__setattr__(self, "_settings", values)
+
 
 settings = Settings()
@@ -0,0 +1,313 @@
+import math
+import sys
+
+from array import array
+from struct import Struct
+
+from .components import DynamicComponent, RacingLine
+from .ecs import Entity
+from .vector import V2
+
+# Snapshots hold the simulation state of a world in a compact binary blob:
+#
+#   header:    magic, version, simulation clock taken at, entity count
+#   entity:    entity id, component count
+#   component: component code, payload length, payload
+#
+# Only simulation state is stored. Sprites, labels and other visuals stay
+# attached to the live entities, which is what makes restoring cheap. It
+# also means a snapshot can't recreate entities, only write back into ones
+# that still exist.
+
+MAGIC = b"MARS"
+VERSION = 3
+
+HEADER = Struct("<4sHdI")
+ENTITY = Struct("<QH")
+COMPONENT = Struct("<BI")
+COUNT = Struct("<I")
+
+PHYSICS = Struct("<16sd16s16sddd")
+SHIP = Struct("<d?d")
+CHECKPOINT = Struct("<??iq")
+MAP = Struct("<?ddqqqqq")
+COUNTDOWN = Struct("<ddd?")
+
+# Stands in for None in optional id and time fields
+NO_ID = -1
+NO_TIME = math.nan
+
+
+def pack_id(entity_id):
+    return NO_ID if entity_id is None else entity_id
+
+
+def unpack_id(value):
+    return None if value == NO_ID else value
+
+
+def pack_time(value):
+    return NO_TIME if value is None else value
+
+
+def unpack_time(value, shift):
+    return None if math.isnan(value) else value + shift
+
+
+def pack_string(value):
+    encoded = (value or "").encode("utf-8")
+    return COUNT.pack(len(encoded)) + encoded
+
+
+def unpack_string(data, offset):
+    (length,) = COUNT.unpack_from(data, offset)
+    offset += COUNT.size
+    return data[offset : offset + length].decode("utf-8"), offset + length
+
+
+def pack_doubles(values):
+    # Snapshots are little endian like the structs above
+    if sys.byteorder != "little":
+        values = array("d", values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def unpack_doubles(data, offset, count):
+    values = array("d")
+    end = offset + count * values.itemsize
+    values.frombytes(data[offset:end])
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values, end
+
+
+def pack_physics(physics):
+    return PHYSICS.pack(
+        bytes(physics.position),
+        physics.rotation,
+        bytes(physics.velocity),
+        bytes(physics.acceleration),
+        physics.acc_constant,
+        physics.drag_constant,
+        physics.mass,
+    )
+
+
+def unpack_physics(physics, data, shift):
+    (
+        position,
+        physics.rotation,
+        velocity,
+        acceleration,
+        physics.acc_constant,
+        physics.drag_constant,
+        physics.mass,
+    ) = PHYSICS.unpack(data)
+    physics.position = V2.from_bytes(position)
+    physics.velocity = V2.from_bytes(velocity)
+    physics.acceleration = V2.from_bytes(acceleration)
+    # Rendering doesn't blend from the pose before the restore
+    physics.previous_position = None
+    physics.previous_rotation = None
+
+
+def pack_ship(ship):
+    return SHIP.pack(ship.boost, ship.boosting, ship.boost_constant)
+
+
+def unpack_ship(ship, data, shift):
+    ship.boost, ship.boosting, ship.boost_constant = SHIP.unpack(data)
+
+
+def pack_checkpoint(checkpoint):
+    return CHECKPOINT.pack(
+        checkpoint.completed,
+        checkpoint.is_next,
+        checkpoint.cp_order,
+        pack_id(checkpoint.map_entity_id),
+    )
+
+
+def unpack_checkpoint(checkpoint, data, shift):
+    completed, is_next, cp_order, map_entity_id = CHECKPOINT.unpack(data)
+    checkpoint.completed = completed
+    checkpoint.is_next = is_next
+    checkpoint.cp_order = cp_order
+    checkpoint.map_entity_id = unpack_id(map_entity_id)
+
+
+def pack_map(map_):
+    parts = [
+        pack_string(map_.mode),
+        MAP.pack(
+            map_.is_active,
+            pack_time(map_.race_start_time),
+            pack_time(map_.race_end_time),
+            pack_id(map_.race_countdown_id),
+            pack_id(map_.speedometer_id),
+            pack_id(map_.pb_ghost_entity_id),
+            pack_id(map_.pb_line_entity_id),
+            pack_id(map_.edit_selection_id),
+        ),
+        COUNT.pack(len(map_.racing_line)),
+    ]
+    line = map_.racing_line
+    for column in (line.x, line.y, line.r, line.dt):
+        parts.append(pack_doubles(column))
+    return b"".join(parts)
+
+
+def unpack_map(map_, data, shift):
+    map_.mode, offset = unpack_string(data, 0)
+    (
+        map_.is_active,
+        race_start_time,
+        race_end_time,
+        race_countdown_id,
+        speedometer_id,
+        pb_ghost_entity_id,
+        pb_line_entity_id,
+        edit_selection_id,
+    ) = MAP.unpack_from(data, offset)
+    offset += MAP.size
+    map_.race_start_time = unpack_time(race_start_time, shift)
+    map_.race_end_time = unpack_time(race_end_time, shift)
+    map_.race_countdown_id = unpack_id(race_countdown_id)
+    map_.speedometer_id = unpack_id(speedometer_id)
+    map_.pb_ghost_entity_id = unpack_id(pb_ghost_entity_id)
+    map_.pb_line_entity_id = unpack_id(pb_line_entity_id)
+    map_.edit_selection_id = unpack_id(edit_selection_id)
+
+    (count,) = COUNT.unpack_from(data, offset)
+    offset += COUNT.size
+    line = RacingLine()
+    line.x, offset = unpack_doubles(data, offset, count)
+    line.y, offset = unpack_doubles(data, offset, count)
+    line.r, offset = unpack_doubles(data, offset, count)
+    line.dt, offset = unpack_doubles(data, offset, count)
+    map_.racing_line = line
+
+
+def pack_countdown(countdown):
+    return pack_string(countdown.purpose) + COUNTDOWN.pack(
+        pack_time(countdown.started_at),
+        pack_time(countdown.duration),
+        pack_time(countdown.last_evaluated),
+        countdown.completed,
+    )
+
+
+def unpack_countdown(countdown, data, shift):
+    countdown.purpose, offset = unpack_string(data, 0)
+    started_at, duration, last_evaluated, completed = COUNTDOWN.unpack_from(
+        data, offset
+    )
+    countdown.started_at = unpack_time(started_at, shift)
+    countdown.duration = unpack_time(duration, 0.0)
+    countdown.last_evaluated = unpack_time(last_evaluated, 0.0)
+    countdown.completed = completed
+
+
+# Component name -> (code, pack, unpack into an existing component)
+CODECS = {
+    "physics": (1, pack_physics, unpack_physics),
+    "ship": (2, pack_ship, unpack_ship),
+    "checkpoint": (3, pack_checkpoint, unpack_checkpoint),
+    "map": (4, pack_map, unpack_map),
+    "countdown": (5, pack_countdown, unpack_countdown),
+}
+# Component name -> (code, component class) for marker components that
+# carry no data, restoring attaches or detaches them to match the snapshot
+MARKERS = {
+    "dynamic": (6, DynamicComponent),
+}
+NAMES_BY_CODE = {code: name for name, (code, _, _) in CODECS.items()}
+NAMES_BY_CODE.update({code: name for name, (code, _) in MARKERS.items()})
+
+
+def snapshot(world=None):
+    """Packs the simulation state of every entity into bytes
+
+    blob = snapshot()
+    ...
+    restore(blob)
+    """
+    world = world or Entity.world
+    parts = []
+    count = 0
+    for entity in world.slots:
+        if entity is None or entity.destroyed:
+            continue
+        components = []
+        for name in entity.archetype.signature:
+            if name in MARKERS:
+                code, _ = MARKERS[name]
+                components.append(COMPONENT.pack(code, 0))
+                continue
+            codec = CODECS.get(name)
+            if codec is None:
+                continue
+            code, pack, _ = codec
+            payload = pack(entity[name])
+            components.append(COMPONENT.pack(code, len(payload)) + payload)
+        if components:
+            parts.append(ENTITY.pack(entity.entity_id, len(components)))
+            parts.extend(components)
+            count += 1
+
+    header = HEADER.pack(MAGIC, VERSION, world.clock, count)
+    return header + b"".join(parts)
+
+
+def restore(blob, world=None):
+    """Writes a snapshot back into the live entities it was taken from
+
+    Times are shifted by however long ago the snapshot was taken, so
+    running countdowns and race timers carry on from where they were.
+
+    Only entities that still exist are restored, and only the components
+    in CODECS and MARKERS. Destroyed entities aren't brought back and
+    entities created since are left alone, recreating or removing them is
+    up to the caller. Returns the ids of snapshotted entities that no
+    longer exist.
+    """
+    world = world or Entity.world
+    magic, version, taken_at, count = HEADER.unpack_from(blob, 0)
+    assert magic == MAGIC, "Not a world snapshot"
+    assert version == VERSION, f"Unsupported snapshot version {version}"
+    shift = world.clock - taken_at
+
+    missing = []
+    offset = HEADER.size
+    for _ in range(count):
+        entity_id, component_count = ENTITY.unpack_from(blob, offset)
+        offset += ENTITY.size
+        entity = world.find(entity_id)
+        if entity is None:
+            missing.append(entity_id)
+        markers = set()
+        for _ in range(component_count):
+            code, length = COMPONENT.unpack_from(blob, offset)
+            offset += COMPONENT.size
+            payload = blob[offset : offset + length]
+            offset += length
+            name = NAMES_BY_CODE[code]
+            if name in MARKERS:
+                markers.add(name)
+                continue
+            if entity is None:
+                continue
+            component = entity[name]
+            if component is not None:
+                _, _, unpack = CODECS[name]
+                unpack(component, payload, shift)
+
+        if entity is None:
+            continue
+        for name, (_, marker_class) in MARKERS.items():
+            if name in markers and entity[name] is None:
+                entity.attach(marker_class())
+            elif name not in markers and entity[name] is not None:
+                entity.detach(name)
+    return missing
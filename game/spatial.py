@@ -0,0 +1,106 @@
+from math import floor, sqrt
+
+# World units per side of a cell, around the size of a mid sized planet
+COLLISION_CELL_SIZE = 512.0
+# Flight path flares light up, brighter the closer, within this distance of
+# the ship. Also the cell size of their index.
+FLARE_DISTANCE = 750.0
+# Relative overlap too small to count, rounding error from resolving one
+TOUCHING = 1e-9
+
+
+def time_of_impact(start, end, center, radius):
+    """Fraction of the way from start to end where a point moving in a
+    straight line first comes within radius of center. 0.0 if it starts
+    inside, None if it doesn't get there or is moving away.
+
+    Sweeping a circle against a circle is the same as sweeping its center
+    against a circle with both radii added.
+    """
+    offset = start - center
+    c = offset.dot_product(offset) - radius * radius
+    # Resting right on the edge, as a bounce leaves it, isn't inside
+    if c < -TOUCHING * radius * radius:
+        return 0.0
+    move = end - start
+    a = move.dot_product(move)
+    b = 2 * offset.dot_product(move)
+    if a == 0 or b >= 0:
+        return None
+    discriminant = b * b - 4 * a * c
+    if discriminant < 0:
+        return None
+    t = (-b - sqrt(discriminant)) / (2 * a)
+    return t if t <= 1 else None
+
+
+class SpatialHash:
+    """Buckets circles into square cells, so finding what is near a point
+    only looks at the cells around it rather than at everything
+
+    Items stay put until inserted again, so things that never move are
+    inserted once and moving ones whenever they move.
+
+    colliders = SpatialHash()
+    colliders.insert(entity, position, radius)
+    for other in colliders.nearby(position, radius):
+        ...
+    colliders.remove(entity)
+    """
+
+    def __init__(self, cell_size=COLLISION_CELL_SIZE):
+        self.cell_size = cell_size
+        # Cell -> items overlapping it
+        self.cells = {}
+        # Item -> cells it overlaps
+        self.items = {}
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, item):
+        return item in self.items
+
+    def covering(self, position, radius):
+        "Cells overlapped by the square around a circle"
+        size = self.cell_size
+        left = floor((position.x - radius) / size)
+        right = floor((position.x + radius) / size)
+        bottom = floor((position.y - radius) / size)
+        top = floor((position.y + radius) / size)
+        return tuple(
+            (x, y) for x in range(left, right + 1) for y in range(bottom, top + 1)
+        )
+
+    def insert(self, item, position, radius):
+        "Adds an item, or moves it if it is already in"
+        cells = self.covering(position, radius)
+        previous = self.items.get(item)
+        if previous == cells:
+            return
+        if previous is not None:
+            self.remove(item)
+        self.items[item] = cells
+        for cell in cells:
+            self.cells.setdefault(cell, set()).add(item)
+
+    def remove(self, item):
+        for cell in self.items.pop(item, ()):
+            bucket = self.cells[cell]
+            bucket.discard(item)
+            if not bucket:
+                del self.cells[cell]
+
+    def nearby(self, position, radius):
+        "Returns the items sharing a cell with a circle, a superset of overlaps"
+        found = set()
+        cells = self.cells
+        for cell in self.covering(position, radius):
+            bucket = cells.get(cell)
+            if bucket:
+                found.update(bucket)
+        return found
+
+    def clear(self):
+        self.cells.clear()
+        self.items.clear()
@@ -0,0 +1,132 @@
+from math import ceil, hypot, sqrt
+
+from . import bodies
+
+# Most steps a forecast grows by in one fixed step. A forecast thrown away,
+# by a change of inputs or a bounce, is rebuilt over a few steps.
+STEPS_PER_UPDATE = 60
+# Furthest the ship may stray from where the forecast had it, in units and
+# units per tick, before the forecast is thrown away
+TOLERANCE = 1e-6
+
+
+def summed_pull(masses, x, y, gravity):
+    "pull() at a single point, masses being (x, y, mass) tuples"
+    ax = ay = 0.0
+    for mx, my, mass in masses:
+        ox = mx - x
+        oy = my - y
+        distance_squared = ox * ox + oy * oy
+        if distance_squared > 0:
+            scale = gravity * mass / distance_squared / sqrt(distance_squared)
+            ax += ox * scale
+            ay += oy * scale
+    return ax, ay
+
+
+def clamped(ax, ay, max_length):
+    "clamp() for a single acceleration"
+    length = hypot(ax, ay)
+    if length > max_length:
+        scale = max_length / length
+        return ax * scale, ay * scale
+    return ax, ay
+
+
+def diverged(state, physics):
+    "Whether the ship isn't where a forecast state had it"
+    x, y, vx, vy = state
+    position = physics.position
+    velocity = physics.velocity
+    return (
+        max(
+            abs(x - position.x),
+            abs(y - position.y),
+            abs(vx - velocity.x),
+            abs(vy - velocity.y),
+        )
+        > TOLERANCE
+    )
+
+
+class Predictor:
+    """Steps a single body ahead the way Bodies.integrate does, with the
+    same integrator and sub-steps, but in plain floats: NumPy's overhead
+    per call dwarfs the math for one body.
+
+    Thrust is held for the whole forecast, and masses that move are held
+    where they were when the predictor was made.
+
+    predictor = Predictor(thrust, drag, time_factor, gravity, max_grav_acc, grid)
+    x, y, vx, vy = predictor.step(x, y, vx, vy)
+    """
+
+    def __init__(
+        self,
+        thrust,
+        drag,
+        time_factor,
+        gravity,
+        max_grav_acc,
+        grid=None,
+        statics=(),
+        moving=(),
+    ):
+        self.thrust = thrust
+        self.drag = drag
+        self.time_factor = time_factor
+        self.gravity = gravity
+        self.max_grav_acc = max_grav_acc
+        self.grid = grid
+        # (x, y, mass) of masses summed directly, the static ones only off
+        # the grid
+        self.statics = list(statics) if grid is None else grid.mass_tuples()
+        self.moving = list(moving)
+
+    def pull(self, x, y):
+        gravity = self.gravity
+        if not gravity:
+            return 0.0, 0.0
+        ax = ay = 0.0
+        if self.moving:
+            ax, ay = summed_pull(self.moving, x, y, gravity)
+        sampled = None if self.grid is None else self.grid.sample_point(x, y)
+        if sampled is None:
+            sx, sy = summed_pull(self.statics, x, y, gravity)
+            if self.grid is not None:
+                sx, sy = clamped(sx, sy, self.max_grav_acc)
+        else:
+            sx, sy = sampled
+        return clamped(ax + sx, ay + sy, self.max_grav_acc)
+
+    def step(self, x, y, vx, vy):
+        "State after one fixed step"
+        time_factor = self.time_factor
+        gx, gy = self.pull(x, y)
+        substeps = 1
+        if bodies.MAX_SUBSTEPS != 1 and hypot(gx, gy) > bodies.SUBSTEP_GRAVITY:
+            substeps = ceil(hypot(vx, vy) * time_factor / bodies.SUBSTEP_DISTANCE)
+            substeps = min(max(substeps, 1), bodies.MAX_SUBSTEPS)
+        h = time_factor / substeps
+        keep = 1 - self.drag * h
+        tx, ty = self.thrust
+        verlet = bodies.INTEGRATOR == "verlet"
+        for k in range(substeps):
+            if k and not verlet:
+                gx, gy = self.pull(x, y)
+            vx *= keep
+            vy *= keep
+            ax = tx + gx
+            ay = ty + gy
+            if verlet:
+                x = x + vx * h + 0.5 * ax * h * h
+                y = y + vy * h + 0.5 * ay * h * h
+                gx, gy = self.pull(x, y)
+                vx += 0.5 * (ax + tx + gx) * h
+                vy += 0.5 * (ay + ty + gy) * h
+            else:
+                vx += ax * h
+                vy += ay * h
+                x = x + vx * h
+                y = y + vy * h
+        return x, y, vx, vy
@@ -1,5 +1,51 @@
+import argparse
+import json
+
 import game
+from game.profiling import PROFILER
 
 
 if __name__ == "__main__":
-    game.run_game()
+    parser = argparse.ArgumentParser(description="Race for the Red Planet")
+    parser.add_argument(
+        "--profile",
+        metavar="STATS_FILE",
+        help="time every system and event handler, dumping stats to the file",
+    )
+    parser.add_argument(
+        "--deterministic",
+        action="store_true",
+        help="one fixed step per frame, so runs replay exactly",
+    )
+    parser.add_argument(
+        "--headless",
+        metavar="MAP",
+        help="simulate the map with no window, GL or audio, printing the result",
+    )
+    parser.add_argument(
+        "--mode", default="racing", help="racing or freeplay, for --headless"
+    )
+    parser.add_argument(
+        "--steps", type=int, default=36000, help="most fixed steps for --headless"
+    )
+    parser.add_argument(
+        "--inputs",
+        metavar="SCRIPT_FILE",
+        help='JSON of inputs by step for --headless, e.g. {"0": {"w": true}}',
+    )
+    args = parser.parse_args()
+
+    if args.profile:
+        PROFILER.enable(stats_path=args.profile)
+
+    if args.headless:
+        from game.headless import Simulation
+
+        script = {}
+        if args.inputs:
+            with open(args.inputs, "r") as f:
+                script = {int(step): keys for step, keys in json.load(f).items()}
+        sim = Simulation(args.headless, mode=args.mode)
+        print(json.dumps(sim.run(args.steps, script)))
+    else:
+        game.run_game(deterministic=args.deterministic)
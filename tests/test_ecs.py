@@ -0,0 +1,59 @@
+from dataclasses import dataclass
+
+from game.ecs import FIXED_DELTA_TIME, Entity, System, World
+
+
+@dataclass
+class CounterComponent:
+    component_name: str = "counter"
+    value: int = 0
+
+
+class CountingSystem(System):
+    reads = ("counter",)
+    writes = ("counter",)
+    fixed_step = True
+
+    def update(self):
+        for entity in self.world.each("counter"):
+            entity["counter"].value += 1
+            self.world.mark_changed(entity, "counter")
+
+
+class ListeningSystem(System):
+    "Only handles events, so it has no update to schedule"
+
+    reads = ()
+    writes = ()
+
+
+def test_changes_are_pruned_with_an_event_only_system():
+    world = World()
+    with world.activated():
+        Entity().attach(CounterComponent())
+        CountingSystem()
+        ListeningSystem()
+
+    pruned = []
+    for _ in range(5):
+        world.advance(FIXED_DELTA_TIME)
+        pruned.append(world.pruned_tick)
+
+    assert not world.systems["ListeningSystem"].scheduled
+    assert pruned == sorted(pruned)
+    assert pruned[-1] > pruned[0] > 0
+
+
+def test_attach_hooks_run_for_new_and_replaced_components():
+    world = World()
+    attached = []
+    world.on_attach("counter", lambda entity, component: attached.append(component))
+    with world.activated():
+        entity = Entity()
+        first = CounterComponent()
+        entity.attach(first)
+        second = CounterComponent(value=1)
+        entity.attach(second)
+        entity.attach(second)
+
+    assert attached == [first, second]